@@ -0,0 +1,105 @@
+import asyncio
+import heapq
+import time
+from random import uniform
+from config import logger, STARTUP_CONCURRENCY, STARTUP_SPACING
+from safari_client import start_userbot
+
+# --- STARTUP ADMISSION ---
+# Userbot connects are admitted through a priority queue with a bounded number
+# in flight and a small gap between starts, instead of all at once. Failed
+# connects are retried with jittered exponential backoff.
+
+PRIORITY_HIGH = 0  # scheduled or mid-hunt users
+PRIORITY_NORMAL = 1
+CONNECT_TIMEOUT = 60
+MAX_ATTEMPTS = 4
+BACKOFF_BASE = 2.0
+
+class AdmissionController:
+    def __init__(self, concurrency=STARTUP_CONCURRENCY, spacing=STARTUP_SPACING):
+        self._heap = []
+        self._seq = 0
+        self._slots = asyncio.Semaphore(concurrency)
+        self._spacing = spacing
+        self._has_work = asyncio.Event()
+        self._runner = None
+        self._reset_counts()
+
+    def _reset_counts(self):
+        self.total = self.connected = self.expired = self.failed = 0
+        self.started_at = None
+        self.finished_at = None
+
+    def admit(self, user_id, session_str, callback, priority=PRIORITY_NORMAL):
+        """Queues a userbot start; higher priority (lower number) goes first.
+
+        Returns a future that resolves to 'connected', 'expired' or 'failed'.
+        """
+        if self.started_at is None or self.finished_at is not None:
+            self._reset_counts()
+            self.started_at = time.monotonic()
+        self.total += 1
+        outcome = asyncio.get_running_loop().create_future()
+        self._push(priority, user_id, session_str, callback, 1, outcome)
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.create_task(self._run())
+        return outcome
+
+    def _push(self, priority, user_id, session_str, callback, attempt, outcome):
+        self._seq += 1
+        heapq.heappush(self._heap, (priority, self._seq, user_id, session_str, callback, attempt, outcome))
+        self._has_work.set()
+
+    def status(self):
+        done = self.connected + self.expired + self.failed
+        elapsed = ((self.finished_at or time.monotonic()) - self.started_at) if self.started_at else 0
+        return {'total': self.total, 'connected': self.connected, 'expired': self.expired,
+                'failed': self.failed, 'pending': self.total - done, 'elapsed': round(elapsed, 1),
+                'finished': self.finished_at is not None}
+
+    async def _run(self):
+        while True:
+            await self._has_work.wait()
+            await self._slots.acquire()
+            if not self._heap:
+                self._slots.release()
+                self._has_work.clear()
+                continue
+            priority, _, *item = heapq.heappop(self._heap)
+            asyncio.create_task(self._attempt(priority, *item))
+            await asyncio.sleep(self._spacing)
+
+    async def _attempt(self, priority, user_id, session_str, callback, attempt, outcome):
+        ready = asyncio.get_running_loop().create_future()
+        task = start_userbot(user_id, session_str, callback, ready)
+        try:
+            ok = await asyncio.wait_for(asyncio.shield(ready), CONNECT_TIMEOUT)
+            if ok: self.connected += 1
+            else: self.expired += 1
+            if not outcome.done(): outcome.set_result('connected' if ok else 'expired')
+        except Exception as e:
+            if not ready.done(): task.cancel()
+            if attempt < MAX_ATTEMPTS:
+                delay = BACKOFF_BASE ** attempt * uniform(0.5, 1.5)
+                logger.warning(f"[STARTUP] {user_id} connect attempt {attempt} failed ({e!r}), retry in {delay:.1f}s")
+                # Retried at the same priority once the backoff is over
+                asyncio.get_running_loop().call_later(
+                    delay, self._push, priority, user_id, session_str, callback, attempt + 1, outcome)
+                return
+            self.failed += 1
+            if not outcome.done(): outcome.set_result('failed')
+        finally:
+            self._slots.release()
+        self._report()
+
+    def _report(self):
+        done = self.connected + self.expired + self.failed
+        if done % 50 == 0 or done == self.total:
+            logger.info(f"[STARTUP] {done}/{self.total} sessions admitted "
+                        f"({self.connected} connected, {self.expired} expired, {self.failed} failed)")
+        if done == self.total and self.finished_at is None:
+            self.finished_at = time.monotonic()
+            logger.info(f"[STARTUP] All sessions admitted in {self.finished_at - self.started_at:.1f}s")
+
+admission = AdmissionController()
@@ -0,0 +1,94 @@
+"""/fullexport and /fullimport on a 10k-user DB: old in-memory JSON vs streamed JSON lines.
+
+Export: time, zip size and peak Python memory. Restore: time to upsert every
+row (old per-row execute loop vs one executemany).
+
+Run from the repo root: python benchmarks/bench_backup.py [users]
+"""
+import asyncio
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+TMP = tempfile.mkdtemp(prefix="safari-backup-")
+os.chdir(TMP)  # config logs to the cwd
+
+import database as db
+from config import DEFAULT_LIST
+
+def make_rows(n):
+    rng = random.Random(n)
+    poke_list = json.dumps(DEFAULT_LIST)
+    return [(uid, "1" + "A" * 352, poke_list, "Safari Ball", rng.randint(0, 500), rng.randint(0, 300),
+             rng.randint(0, 200), rng.randint(0, 5), "2026-01-01T00:00:00", 0, 0, 2.5,
+             "10:00 AM" if rng.random() < 0.5 else None, rng.randint(0, 1)) for uid in range(1, n + 1)]
+
+async def old_export():
+    data = await db.fetch_all(("SELECT * FROM users"))
+    users = [dict(zip(data[0], row)) for row in data[1]]
+    json_data = json.dumps(users, indent=4)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("hexabot_data.json", json_data)
+    return buffer.getvalue()
+
+async def old_restore(blob):
+    users = json.loads(zipfile.ZipFile(io.BytesIO(blob)).read("hexabot_data.json"))
+    async def job(c):
+        for u in users:
+            await c.execute("""INSERT OR REPLACE INTO users
+                              (user_id, session, poke_list, ball, total_matched, total_caught, total_fled, total_shiny, start_time, notification_status, group_id, interval, schedule_time, schedule_active)
+                              VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                           (u['user_id'], u['session'], u['poke_list'], u['ball'],
+                            u['total_matched'], u['total_caught'], u['total_fled'], u.get('total_shiny', 0),
+                            u['start_time'], u['notification_status'], u['group_id'], u.get('interval', 2.5),
+                            u.get('schedule_time'), u.get('schedule_active', 0)))
+    await db.write(job)
+
+async def timed(factory):
+    """Runs `await factory()` twice: once for the time, once under tracemalloc for peak memory."""
+    t0 = time.perf_counter()
+    result = await factory()
+    elapsed = time.perf_counter() - t0
+    tracemalloc.start()
+    await factory()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+async def main(n):
+    await db.init_db()
+    await db.write(lambda c: c.executemany(
+        """INSERT INTO users (user_id, session, poke_list, ball, total_matched, total_caught, total_fled, total_shiny,
+           start_time, notification_status, group_id, interval, schedule_time, schedule_active)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", make_rows(n)))
+
+    blob, t_old, m_old = await timed(old_export)
+    path = os.path.join(TMP, "new.zip")
+    _, t_new, m_new = await timed(lambda: db.export_users(path))
+    print(f"{n} users")
+    print(f"  export  old: {t_old * 1000:6.0f} ms  {len(blob) / 1024:7.0f} KiB  peak {m_old / 2**20:6.1f} MiB")
+    print(f"          new: {t_new * 1000:6.0f} ms  {os.path.getsize(path) / 1024:7.0f} KiB  peak {m_new / 2**20:6.1f} MiB")
+
+    # Incremental: touch 1% of users, export only those
+    since = int(time.time())
+    await db.execute("UPDATE users SET ball = 'Great Ball' WHERE user_id % 100 = 0")
+    inc_path = os.path.join(TMP, "inc.zip")
+    count, t_inc, _ = await timed(lambda: db.export_users(inc_path, since))
+    print(f"          inc: {t_inc * 1000:6.0f} ms  {os.path.getsize(inc_path) / 1024:7.0f} KiB  ({count} changed users)")
+
+    _, t_old, m_old = await timed(lambda: old_restore(blob))
+    restored, t_new, m_new = await timed(lambda: db.restore_users(path))
+    print(f"  restore old: {t_old * 1000:6.0f} ms  (json.load, then per-row execute; peak {m_old / 2**20:.1f} MiB)")
+    print(f"          new: {t_new * 1000:6.0f} ms  (executemany, streamed from the zip; {len(restored)} users, peak {m_new / 2**20:.1f} MiB)")
+    await db.close_db()
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000))
@@ -0,0 +1,56 @@
+"""Classifying HeXamonbot messages: old substring/regex chain vs classify().
+
+The corpus in hexa_corpus.json mirrors the bot's message shapes the handler
+reacts to. Run from the repo root: python benchmarks/bench_classifier.py
+"""
+import json
+import os
+import re
+import sys
+import timeit
+from types import SimpleNamespace
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from classifier import classify
+
+def load_corpus():
+    with open(os.path.join(HERE, "hexa_corpus.json"), encoding="utf-8") as f:
+        items = json.load(f)
+    corpus = []
+    for item in items:
+        markup = None
+        if item["buttons"]:
+            rows = [SimpleNamespace(buttons=[SimpleNamespace(text=t) for t in row]) for row in item["buttons"]]
+            markup = SimpleNamespace(rows=rows)
+        corpus.append((item["text"], markup))
+    return corpus
+
+def old_chain(text, markup):
+    """The checks the handler used to run, in the same order."""
+    text_lower = text.lower()
+    if "welcome to the" in text_lower and "safari zone" in text_lower: return "welcome"
+    if "already in the" in text_lower and "safari zone" in text_lower: return "already"
+    if any(x in text_lower for x in ["already played", "limit reached", "out of safari balls", "game has finished"]): return "stopper"
+    if re.search(r"wait\s+(\d+)\s+second", text_lower): return "wait"
+    if "wait" in text_lower and "second" in text_lower: return "wait"
+    if "caught a wild" in text_lower: return "caught"
+    if text.strip().startswith("Wild") or (markup and "throw ball" in markup.rows[0].buttons[0].text.lower()): return "battle"
+    if re.search(r"wild\s+(.+?)\s+\(Lv", text, re.IGNORECASE): return "spawn"
+    return None
+
+def per_msg_us(fn, corpus, number):
+    total = timeit.timeit(lambda: [fn(t, m) for t, m in corpus], number=number)
+    return total / (number * len(corpus)) * 1e6
+
+def main():
+    corpus = load_corpus()
+    for text, markup in corpus:
+        print(f"{type(classify(text, markup)).__name__:>9} | {text.splitlines()[0]}")
+    old = per_msg_us(old_chain, corpus, 5000)
+    new = per_msg_us(classify, corpus, 5000)
+    print(f"\n{len(corpus)} messages | old chain: {old:.2f} us/msg | classify: {new:.2f} us/msg")
+
+if __name__ == '__main__':
+    main()
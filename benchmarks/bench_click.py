@@ -0,0 +1,76 @@
+"""Event-to-click time: refetch-then-click (old) vs clicking the event's message.
+
+Telegram round-trips are simulated with a fixed RTT so the numbers show the
+saved request; the per-click CPU cost of the button lookup is reported too.
+Run from the repo root: python benchmarks/bench_click.py [rtt_ms]
+"""
+import asyncio
+import itertools
+import os
+import sys
+import time
+import timeit
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from safari_client import robust_click, find_button
+
+RTT = float(sys.argv[1]) / 1000 if len(sys.argv) > 1 else 0.08
+
+def make_markup():
+    labels = [["Engage"], ["Throw Ball", "Run"], ["Bag", "Pokemon"]]
+    return SimpleNamespace(rows=[SimpleNamespace(buttons=[SimpleNamespace(text=t) for t in row]) for row in labels])
+
+class FakeMessage:
+    def __init__(self):
+        self.id = 1
+        self.reply_markup = make_markup()
+
+    async def click(self, i):
+        await asyncio.sleep(RTT)
+
+class FakeClient:
+    def __init__(self, message):
+        self.message = message
+
+    async def get_messages(self, chat_id, ids=None):
+        await asyncio.sleep(RTT)
+        return self.message
+
+async def old_click(client, chat_id, msg_id, text_to_click):
+    """The previous robust_click body (single successful attempt)."""
+    msg = await client.get_messages(chat_id, ids=msg_id)
+    all_buttons = [b for row in msg.reply_markup.rows for b in row.buttons]
+    for i, btn in enumerate(all_buttons):
+        if text_to_click.lower() in btn.text.lower():
+            await msg.click(i)
+            return True
+    return False
+
+async def timed(coro_factory, rounds=20):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        await coro_factory()
+    return (time.perf_counter() - start) / rounds * 1000
+
+async def main():
+    msg = FakeMessage()
+    client = FakeClient(msg)
+    old = await timed(lambda: old_click(client, "bot", msg.id, "Throw Ball"))
+    # A fresh account per round: this measures the click path, not the governor's 2/s click budget
+    accounts = itertools.count(1)
+    new = await timed(lambda: robust_click(client, "bot", msg, "Throw Ball", next(accounts)))
+    print(f"RTT {RTT * 1000:.0f} ms | old: {old:.1f} ms/click | new: {new:.1f} ms/click")
+
+    markup = msg.reply_markup
+    def old_lookup():
+        all_buttons = [b for row in markup.rows for b in row.buttons]
+        return next(i for i, b in enumerate(all_buttons) if "throw ball" in b.text.lower())
+    n = 100000
+    a = timeit.timeit(old_lookup, number=n) / n * 1e6
+    b = timeit.timeit(lambda: find_button(markup, "Throw Ball"), number=n) / n * 1e6
+    print(f"button lookup | old: {a:.2f} us | new: {b:.2f} us")
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,38 @@
+"""Per-spawn cost of the target-list check: old any() scan vs TargetMatcher.
+
+Run from the repo root: python benchmarks/bench_matcher.py
+"""
+import os
+import random
+import string
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import DEFAULT_LIST
+from matcher import get_matcher
+
+SPAWNS = ["Pidgey", "Rattata", "Rayquaza", "Bulbasaur", "Shiny Magikarp", "Zygarde"]
+
+def make_list(size):
+    rng = random.Random(size)
+    names = list(DEFAULT_LIST)
+    while len(names) < size:
+        names.append("".join(rng.choice(string.ascii_letters) for _ in range(rng.randint(4, 11))))
+    return names
+
+def per_call_us(fn, number):
+    total = timeit.timeit(lambda: [fn(n) for n in SPAWNS], number=number)
+    return total / (number * len(SPAWNS)) * 1e6
+
+def main():
+    for size in (50, 1000):
+        names = make_list(size)
+        matcher = get_matcher(names)
+        old = per_call_us(lambda name: any(t.lower() in name.lower() for t in names), 200)
+        new = per_call_us(matcher.matches, 20000)
+        print(f"{size:>5} names | any(): {old:8.2f} us/spawn | matcher: {new:6.2f} us/spawn")
+
+if __name__ == '__main__':
+    main()
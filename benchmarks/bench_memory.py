@@ -0,0 +1,95 @@
+"""Memory held by user_configs for 10k loaded users: old dict-of-dicts vs UserState.
+
+Builds a throwaway DB (most users on the default list, some with their own),
+then measures each layout with tracemalloc after loading every row.
+
+Run from the repo root: python benchmarks/bench_memory.py [users]
+"""
+import asyncio
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(tempfile.mkdtemp(prefix="safari-mem-"))  # config logs to the cwd
+
+import database as db
+from config import DEFAULT_LIST, DEFAULT_INTERVAL
+
+def make_rows(n):
+    rng = random.Random(n)
+    custom = [json.dumps(rng.sample(DEFAULT_LIST, 10)) for _ in range(20)]
+    default = json.dumps(DEFAULT_LIST)
+    rows = []
+    for uid in range(1, n + 1):
+        rows.append((uid, "1" + "A" * 352, default if rng.random() < 0.9 else rng.choice(custom), "Safari Ball",
+                     rng.randint(0, 500), rng.randint(0, 300), rng.randint(0, 200), rng.randint(0, 5),
+                     "2026-01-01T00:00:00", 0, 0, DEFAULT_INTERVAL,
+                     "10:00 AM" if rng.random() < 0.5 else None, 1 if rng.random() < 0.5 else 0))
+    return rows
+
+def load_legacy(cols, rows):
+    """The layout user_configs had before UserState."""
+    out = {}
+    for row in rows:
+        data = dict(zip(cols, row))
+        try: current_list = json.loads(data['poke_list'])
+        except: current_list = DEFAULT_LIST
+        out[data['user_id']] = {
+            'list': current_list, 'ball': data['ball'], 'hunting': False, 'mode': 'STOPPED',
+            'interval': data.get('interval', DEFAULT_INTERVAL),
+            'schedule_time': data.get('schedule_time'),
+            'schedule_active': data.get('schedule_active', 0) == 1,
+            'stats': {'total_caught': data['total_caught'], 'total_fled': data['total_fled'],
+                      'total_matched': data['total_matched'], 'total_shiny': data.get('total_shiny', 0),
+                      'daily_caught': data.get('daily_caught', 0), 'daily_fled': data.get('daily_fled', 0),
+                      'daily_matched': data.get('daily_matched', 0), 'daily_shiny': data.get('daily_shiny', 0)},
+            'notification_status': data['notification_status'], 'group_id': data['group_id'],
+        }
+    return out
+
+def measure(fn):
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    keep = fn()
+    elapsed = time.perf_counter() - t0
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return keep, size, elapsed
+
+async def main(n):
+    await db.init_db()
+    await db.write(lambda c: c.executemany(
+        """INSERT INTO users (user_id, session, poke_list, ball, total_matched, total_caught, total_fled, total_shiny,
+           start_time, notification_status, group_id, interval, schedule_time, schedule_active)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", make_rows(n)))
+    # Rows as load_users sees them; the sessions are dropped after startup either way
+    cols, rows = await db.fetch_all("SELECT * FROM users")
+
+    legacy, legacy_size, legacy_t = measure(lambda: load_legacy(cols, rows))
+    del legacy
+
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    await db.load_users()
+    new_t = time.perf_counter() - t0
+    gc.collect()
+    # Only what stays alive: user_configs and the shared matchers (the returned rows are dropped)
+    new_size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    print(f"{n} users")
+    print(f"  dict-of-dicts : {legacy_size / 1024:8.0f} KiB  ({legacy_size / n:6.0f} B/user)  built in {legacy_t * 1000:.0f} ms")
+    print(f"  UserState     : {new_size / 1024:8.0f} KiB  ({new_size / n:6.0f} B/user)  load_users in {new_t * 1000:.0f} ms (incl. DB read)")
+    await db.close_db()
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000))
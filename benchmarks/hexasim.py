@@ -0,0 +1,235 @@
+"""Local stand-in for HeXamonbot and the Telegram transport.
+
+SimBot plays a scripted safari for every simulated account: welcome,
+spawns (some shiny, some on the default target list), Engage -> battle
+screen with inline buttons, Throw Ball -> catch (with a sprite), flee or another
+throw, "wait N seconds" replies to early /hunt, and the out-of-balls stopper.
+SimClient implements the small slice of TelegramClient the userbot code
+uses; SimMaster records what the master bot would have sent.
+"""
+import asyncio
+import math
+import random
+import time
+from types import SimpleNamespace
+
+from config import DEFAULT_LIST
+
+COMMONS = ["Pidgey", "Rattata", "Caterpie", "Weedle", "Zubat", "Geodude", "Magikarp",
+           "Oddish", "Psyduck", "Poliwag", "Tentacool", "Spearow", "Ekans", "Sandshrew"]
+
+def _markup(*rows):
+    return SimpleNamespace(rows=[SimpleNamespace(buttons=[SimpleNamespace(text=t) for t in row]) for row in rows])
+
+class SimMessage:
+    def __init__(self, client, msg_id, text, markup=None, photo=None):
+        self._client = client
+        self.id = msg_id
+        self.chat_id = "HeXamonbot"
+        self.raw_text = text
+        self.reply_markup = markup
+        self.photo = photo
+        self.document = None
+        self.media = photo
+        self.out = False
+
+    async def click(self, i):
+        labels = [b.text for row in self.reply_markup.rows for b in row.buttons]
+        await self._client.bot.on_click(self._client, self, labels[i])
+
+class SimEvent:
+    def __init__(self, message):
+        self.message = message
+        self.raw_text = message.raw_text
+
+class SimClient:
+    """The subset of TelegramClient used by run_userbot and its loops."""
+
+    def __init__(self, bot, user_id, connect_latency=0.05):
+        self.bot = bot
+        self.user_id = user_id
+        self.connect_latency = connect_latency
+        self._handlers = []
+        self._connected = False
+        self._closed = None
+        self._messages = {}
+        self._next_id = 0
+
+    async def connect(self):
+        await asyncio.sleep(self.connect_latency)
+        self._connected = True
+        self._closed = asyncio.Event()
+
+    async def is_user_authorized(self):
+        return True
+
+    def is_connected(self):
+        return self._connected
+
+    async def disconnect(self):
+        self._connected = False
+        if self._closed: self._closed.set()
+
+    async def run_until_disconnected(self):
+        await self._closed.wait()
+
+    def on(self, builder):
+        def decorator(func):
+            self._handlers.append((type(builder).__name__, func))
+            return func
+        return decorator
+
+    async def send_message(self, chat, text):
+        asyncio.get_running_loop().call_later(self.bot.latency, self.bot.on_command, self, text)
+
+    async def get_messages(self, chat, ids=None, limit=None, min_id=0):
+        if ids is not None: return self._messages.get(ids)
+        newer = [m for i, m in sorted(self._messages.items(), reverse=True) if i > min_id]
+        return newer[:limit]
+
+    def drop(self):
+        """Simulates a lost connection (what the bot sends meanwhile is kept, not delivered)."""
+        self._connected = False
+        self._closed.set()
+
+    async def get_entity(self, chat):
+        return SimpleNamespace(id=1)
+
+    async def get_input_entity(self, chat):
+        self.bot.counts['resolves'] += 1
+        return SimpleNamespace(user_id=1, access_hash=self.user_id * 7919)
+
+    async def download_media(self, message, file=None):
+        return b"\x89PNG" + bytes(2048)
+
+    # --- bot side ---
+    def new_message(self, text, markup=None, photo=None):
+        self._next_id += 1
+        msg = SimMessage(self, self._next_id, text, markup, photo)
+        self._messages[msg.id] = msg
+        self._dispatch(msg, 'NewMessage')
+        return msg
+
+    def edit_message(self, msg, text, markup=None):
+        msg.raw_text = text
+        msg.reply_markup = markup
+        self._dispatch(msg, 'MessageEdited')
+
+    def _dispatch(self, msg, kind):
+        if not self._connected: return
+        for builder, handler in self._handlers:
+            if builder == kind: asyncio.create_task(handler(SimEvent(msg)))
+
+class SimBot:
+    """Scripted HeXamonbot shared by every simulated account."""
+
+    def __init__(self, latency=0.05, cooldown=2.0, balls=30, spawn_rate=0.35,
+                 target_rate=0.15, shiny_rate=0.02, catch_rate=0.5, flee_rate=0.2, seed=1):
+        self.latency = latency
+        self.cooldown = cooldown
+        self.balls = balls
+        self.spawn_rate = spawn_rate
+        self.target_rate = target_rate
+        self.shiny_rate = shiny_rate
+        self.catch_rate = catch_rate
+        self.flee_rate = flee_rate
+        self.rng = random.Random(seed)
+        self._state = {}
+        self._shown_at = {}  # (client, msg id) -> time the current screen was sent
+        self.counts = dict(hunts=0, rejected=0, spawns=0, shinies=0, engages=0,
+                           throws=0, catches=0, fled=0, finished=0, resolves=0)
+        self.engage_latency = []
+        self.throw_latency = []
+
+    def _st(self, client):
+        st = self._state.get(client.user_id)
+        if st is None:
+            st = self._state[client.user_id] = {'in_zone': False, 'done': False,
+                                                'balls': self.balls, 'last_hunt': 0.0}
+        return st
+
+    def on_command(self, client, text):
+        st = self._st(client)
+        if text == "/enter":
+            if st['done']: client.new_message("You have already played the Safari today. Come back tomorrow!")
+            elif st['in_zone']: client.new_message("You are already in the Safari Zone!")
+            else:
+                st['in_zone'] = True
+                client.new_message(f"Welcome to the Safari Zone!\nYou have {st['balls']} Safari Balls. Use /hunt to search for Pokemon.")
+            return
+        if text != "/hunt" or not st['in_zone']: return
+
+        self.counts['hunts'] += 1
+        now = time.monotonic()
+        if now - st['last_hunt'] < self.cooldown:
+            self.counts['rejected'] += 1
+            wait = math.ceil(self.cooldown - (now - st['last_hunt']))
+            client.new_message(f"Please wait {wait} seconds before hunting again.")
+            return
+        st['last_hunt'] = now
+
+        if self.rng.random() >= self.spawn_rate:
+            client.new_message("You found nothing. Try /hunt again.")
+            return
+        self.counts['spawns'] += 1
+        name = self.rng.choice(DEFAULT_LIST) if self.rng.random() < self.target_rate else self.rng.choice(COMMONS)
+        if self.rng.random() < self.shiny_rate:
+            self.counts['shinies'] += 1
+            name = f"✨ Shiny {name}"
+        msg = client.new_message(f"A wild {name} (Lv. {self.rng.randint(5, 70)}) has appeared!", _markup(["Engage"]))
+        msg.species = name
+        self._shown_at[(client, msg.id)] = time.monotonic()
+
+    async def on_click(self, client, msg, label):
+        await asyncio.sleep(self.latency)
+        shown = self._shown_at.pop((client, msg.id), None)
+        st = self._st(client)
+        if label == "Engage":
+            self.counts['engages'] += 1
+            if shown: self.engage_latency.append(time.monotonic() - shown - self.latency)
+            self._battle(client, msg, st, "")
+        elif label == "Throw Ball":
+            self.counts['throws'] += 1
+            if shown: self.throw_latency.append(time.monotonic() - shown - self.latency)
+            st['balls'] -= 1
+            if self.rng.random() < self.catch_rate:
+                self.counts['catches'] += 1
+                sprite = SimpleNamespace(id=hash(msg.species.replace("✨ Shiny ", "")) & 0xFFFF)
+                client.new_message(f"You caught a wild {msg.species}!\nIt has been added to your PC.", photo=sprite)
+            elif self.rng.random() < self.flee_rate:
+                self.counts['fled'] += 1
+                client.new_message(f"The wild {msg.species} fled!")
+            elif st['balls'] > 0:
+                self._battle(client, msg, st, "The ball broke free!")
+            if st['balls'] <= 0:
+                st['in_zone'], st['done'] = False, True
+                self.counts['finished'] += 1
+                client.new_message("You are out of Safari Balls! The game has finished.")
+
+    def _battle(self, client, msg, st, note):
+        client.edit_message(msg, f"Wild {msg.species} [Lv. 30]\nHP: ██████████ 100%\n{note}\n\nSafari Balls left: {st['balls']}",
+                            _markup(["Throw Ball"], ["Run"]))
+        self._shown_at[(client, msg.id)] = time.monotonic()
+
+class SimMaster:
+    """Records the master bot's sends instead of talking to Telegram."""
+
+    def __init__(self, latency=0.05):
+        self.latency = latency
+        self.messages = 0
+        self.files = 0
+        self.uploads = 0
+
+    async def send_message(self, chat, text):
+        await asyncio.sleep(self.latency)
+        self.messages += 1
+
+    async def upload_file(self, data, file_name=None):
+        await asyncio.sleep(self.latency)
+        self.uploads += 1
+        return SimpleNamespace(name=file_name)
+
+    async def send_file(self, chat, file, caption=None):
+        await asyncio.sleep(self.latency)
+        self.files += 1
+        return SimpleNamespace(media=SimpleNamespace(uploaded=file))
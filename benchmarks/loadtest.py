@@ -0,0 +1,128 @@
+"""Load test: the real userbot code against a simulated HeXamonbot.
+
+Every account runs the real run_userbot / send_hunt_loop / handler and the
+real notify_user -> Notifier -> deliver_alert path; only the Telegram
+transport and the bot are simulated (benchmarks/hexasim.py).
+
+Run from the repo root:
+    python benchmarks/loadtest.py                 # 10, 100 and 1000 accounts
+    python benchmarks/loadtest.py -a 100 -d 30    # one size, 30s
+    python benchmarks/loadtest.py --human         # keep the human-like click delays
+
+Each size runs in a fresh subprocess so CPU and memory figures don't bleed
+between runs.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+def _pct(values, q):
+    if not values: return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] * 1000
+
+async def run_one(accounts, duration, human, interval, drops):
+    import config
+    import safari_client
+    import main
+    from hexasim import SimBot, SimClient, SimMaster
+
+    bot = SimBot()
+    sim_master = SimMaster()
+    main.master = sim_master
+    safari_client.make_client = lambda session: SimClient(bot, int(session))
+    if not human:
+        safari_client.ENGAGE_DELAY = safari_client.THROW_DELAY = (0, 0)
+    main.notifier.start()
+    await main.db.init_db()
+    asyncio.create_task(main.db.stats_flusher())
+
+    c = bot.counts
+    cpu0, wall0 = time.process_time(), time.monotonic()
+    readies = []
+    for uid in range(1, accounts + 1):
+        config.user_configs[uid] = main.UserState()
+        if interval: config.user_configs[uid].interval = interval
+        ready = asyncio.get_running_loop().create_future()
+        safari_client.start_userbot(uid, str(uid), main.notify_user, ready)
+        readies.append(ready)
+    await asyncio.gather(*readies)
+    connected_in = time.monotonic() - wall0
+
+    for uid in range(1, accounts + 1):
+        safari_client.start_safari(uid)
+    if drops:
+        # Drop a share of the accounts halfway through; they should reconnect and carry on
+        await asyncio.sleep(duration / 2)
+        for client in random.sample(list(config.user_clients.values()), int(accounts * drops)):
+            client.drop()
+        await asyncio.sleep(duration / 2)
+    else:
+        await asyncio.sleep(duration)
+    wall = time.monotonic() - wall0
+    cpu = time.process_time() - cpu0
+
+    for uid in range(1, accounts + 1):
+        safari_client.stop_safari(uid)
+    for task in list(config.user_tasks.values()):
+        task.cancel()
+    await asyncio.sleep(0)
+    await main.db.close_db()
+
+    try:
+        import resource
+        peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:
+        peak_mb = float('nan')
+
+    print(f"accounts={accounts} duration={duration}s interval={interval or config.DEFAULT_INTERVAL}s human_delays={'on' if human else 'off'}")
+    print(f"  all connected in  {connected_in * 1000:.0f} ms ({c['resolves']} username resolutions)")
+    print(f"  /hunt sent        {c['hunts']} ({c['hunts'] / duration:.1f}/s), rejected (wait) {c['rejected']}")
+    print(f"  spawns            {c['spawns']} (shiny {c['shinies']}), engages {c['engages']}, throws {c['throws']}, catches {c['catches']}, fled {c['fled']}")
+    print(f"  sessions finished {c['finished']}")
+    print(f"  engage latency    p50 {_pct(bot.engage_latency, 0.5):.1f} ms  p95 {_pct(bot.engage_latency, 0.95):.1f} ms")
+    print(f"  throw latency     p50 {_pct(bot.throw_latency, 0.5):.1f} ms  p95 {_pct(bot.throw_latency, 0.95):.1f} ms")
+    if drops:
+        stats = safari_client.conn_stats.values()
+        print(f"  reconnects        {sum(s['reconnects'] for s in stats)} "
+              f"(downtime avg {statistics.mean(s['downtime'] for s in stats) if stats else 0:.1f}s)")
+    print(f"  master sends      {sim_master.messages} messages, {sim_master.files} files, {sim_master.uploads} uploads")
+    print(f"  cpu               {cpu:.2f}s ({cpu / wall * 100:.0f}% of one core), peak rss {peak_mb:.0f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-a', '--accounts', type=int, action='append',
+                        help="account count (repeatable; default 10, 100, 1000)")
+    parser.add_argument('-d', '--duration', type=float, default=20.0, help="seconds of hunting per run")
+    parser.add_argument('-i', '--interval', type=float, help="per-user /hunt timer (default DEFAULT_INTERVAL)")
+    parser.add_argument('--drops', type=float, default=0.0, help="share of accounts to disconnect halfway (0-1)")
+    parser.add_argument('--human', action='store_true', help="keep ENGAGE_DELAY/THROW_DELAY")
+    parser.add_argument('--single', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    sizes = args.accounts or [10, 100, 1000]
+
+    if args.single:
+        # Imports create log/session files in the cwd, so run from a temp dir
+        os.chdir(tempfile.mkdtemp(prefix="safari-load-"))
+        sys.path[:0] = [ROOT, HERE]
+        asyncio.run(run_one(sizes[0], args.duration, args.human, args.interval, args.drops))
+        return
+
+    for n in sizes:
+        cmd = [sys.executable, os.path.abspath(__file__), '--single', '-a', str(n), '-d', str(args.duration)]
+        if args.human: cmd.append('--human')
+        if args.interval: cmd += ['-i', str(args.interval)]
+        if args.drops: cmd += ['--drops', str(args.drops)]
+        subprocess.run(cmd, check=True)
+
+if __name__ == '__main__':
+    main()
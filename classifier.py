@@ -0,0 +1,76 @@
+import re
+from typing import NamedTuple, Optional
+
+# --- MESSAGE TYPES ---
+class Welcome(NamedTuple):
+    pass
+
+class AlreadyIn(NamedTuple):
+    pass
+
+class Stopper(NamedTuple):
+    line: str
+
+class Wait(NamedTuple):
+    seconds: Optional[int]  # None when the bot didn't say how long
+
+class Caught(NamedTuple):
+    line: str
+
+class Fled(NamedTuple):
+    line: str
+
+class Battle(NamedTuple):
+    pass
+
+class Spawn(NamedTuple):
+    name: str
+    shiny: bool
+    level: Optional[int] = None
+
+# The text is lowercased once and checked with plain substring tests (these
+# run in C and beat a big regex alternation); the capture regexes below only
+# run once their keyword has been seen.
+_STOPPERS = ("already played", "limit reached", "out of safari balls", "game has finished")
+_WAIT_RE = re.compile(r"wait\s+(\d+)\s+second")
+_SPAWN_RE = re.compile(r"wild\s+(.+?)\s+\(Lv\.?\s*(\d+)?", re.IGNORECASE)
+
+def species_of(name):
+    """Spawn name without the shiny marker ("✨ Shiny Magikarp" -> "Magikarp")."""
+    name = name.replace("✨", "").strip()
+    return name[6:] if name.lower().startswith("shiny ") else name
+
+def _first_line(text):
+    return text.split("\n", 1)[0]
+
+def _is_battle(text, markup):
+    if text.lstrip().startswith("Wild"): return True
+    if markup is None: return False
+    try:
+        return "throw ball" in markup.rows[0].buttons[0].text.lower()
+    except (AttributeError, IndexError):
+        return False
+
+def classify(text, markup=None):
+    """Returns the typed kind of a HeXamonbot message, or None if irrelevant.
+
+    Priority follows the handler: welcome, already-in, stopper, wait,
+    caught, fled, battle, spawn.
+    """
+    text_lower = text.lower()
+
+    if "safari zone" in text_lower:
+        if "welcome to the" in text_lower: return Welcome()
+        if "already in the" in text_lower: return AlreadyIn()
+    for phrase in _STOPPERS:
+        if phrase in text_lower: return Stopper(_first_line(text))
+    if "wait" in text_lower and "second" in text_lower:
+        m = _WAIT_RE.search(text_lower)
+        return Wait(int(m.group(1)) if m else None)
+    if "caught a wild" in text_lower: return Caught(_first_line(text))
+    if "fled" in text_lower: return Fled(_first_line(text))
+    if _is_battle(text, markup): return Battle()
+    if "wild" in text_lower:
+        m = _SPAWN_RE.search(text)
+        if m: return Spawn(m.group(1).strip(), "✨" in text, int(m.group(2)) if m.group(2) else None)
+    return None
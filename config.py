@@ -3,6 +3,7 @@ import os
 from dotenv import load_dotenv
 from datetime import timedelta, timezone
 from telethon import TelegramClient
+from logs import setup_logging
 
 # Load variables from .env file
 load_dotenv()
@@ -15,11 +16,27 @@ BOT_TOKEN = os.getenv('BOT_TOKEN', '')
 OWNER_ID = int(os.getenv('OWNER_ID', 0))
 
 HEXA_ID = "HeXamonbot"
-LOG_FILE = "safari_bot.log"
+LOG_FILE = os.getenv('SAFARI_LOG_FILE', "safari_bot.log")  # shard workers get their own file
 IST = timezone(timedelta(hours=5, minutes=30))
 
 # --- DEFAULTS ---
 DEFAULT_INTERVAL = 2.5  
+ENGAGE_DELAY = (0.5, 1.5)  # human-like reaction before Engage (seconds)
+THROW_DELAY = (2.0, 4.0)  # ... and before Throw Ball
+HUNT_JITTER = (0.1, 0.4)  # added on top of the learned /hunt cooldown
+SHARDS = int(os.getenv('SHARDS', 0))  # >1 runs userbots in that many worker processes
+STARTUP_CONCURRENCY = 5  # userbot connects in flight at boot
+STARTUP_SPACING = 0.2  # seconds between admitted connects
+METRICS_PORT = int(os.getenv('METRICS_PORT', 9108))  # local Prometheus endpoint, 0 disables
+STATS_FLUSH_INTERVAL = 2.0  # seconds between batched stat writes
+DAILY_RESET_HOUR = 5  # daily stats roll over at this hour (IST)
+LOG_MAX_BYTES = 10 * 1024 * 1024  # rotate the log past this size (and daily)
+LOG_BACKUPS = 5  # rotated log files kept
+LOG_WAIT_SAMPLE = int(os.getenv('LOG_WAIT_SAMPLE', 1))  # keep 1 in N [WAIT] lines per user
+LOG_TAIL_LINES = 2000  # lines per file sent by /log
+HIBERNATE_AFTER = int(os.getenv('HIBERNATE_AFTER', 900))  # disconnect userbots idle this long (s), 0 disables
+GOVERNOR_RATE = float(os.getenv('GOVERNOR_RATE', 0))  # Telegram requests/s shared by all accounts, 0 = per-account limits only
+WAKE_LEAD = 120  # seconds before a scheduled start to reconnect a hibernated userbot
 DEFAULT_LIST = ["Mewtwo","Lugia","Ho-Oh","Celebi","Latias","Latios",
   "Kyogre","Groudon","Rayquaza","Jirachi","Deoxys","Dialga","Palkia",
   "Regigigas","Giratina","Cresselia",
@@ -33,8 +50,10 @@ DEFAULT_LIST = ["Mewtwo","Lugia","Ho-Oh","Celebi","Latias","Latios",
 
 # --- GLOBAL STATE ---
 user_clients = {}
+user_peers = {}  # user_id -> cached input peer of HeXamonbot
 user_configs = {}
 user_tasks = {}
+user_signals = {}
 
 scheduler_settings = {
     'active': False,
@@ -44,13 +63,7 @@ scheduler_settings = {
 }
 
 # --- LOGGING ---
-logging.basicConfig(
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    level=logging.INFO,
-    handlers=[
-        logging.FileHandler(LOG_FILE),
-        logging.StreamHandler()
-    ]
-)
+# Queued; a background thread writes and rotates the file (see logs.py)
+setup_logging(LOG_FILE, LOG_MAX_BYTES, LOG_BACKUPS, LOG_WAIT_SAMPLE)
 logger = logging.getLogger("SafariBot")
 
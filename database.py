@@ -1,16 +1,105 @@
-import sqlite3
+import asyncio
 import json
-from config import logger, user_configs, DEFAULT_LIST, DEFAULT_INTERVAL
+import time
+import zipfile
+from contextlib import asynccontextmanager
+import aiosqlite
+from config import logger, user_configs, DEFAULT_LIST, DEFAULT_INTERVAL, STATS_FLUSH_INTERVAL
+from matcher import get_matcher
+from state import UserState, STAT_KINDS, stats_day, today, ist_hour, IST_OFFSET
 
-conn = sqlite3.connect('hexabot.db', check_same_thread=False)
-cursor = conn.cursor()
+DB_FILE = 'hexabot.db'
+READ_POOL_SIZE = 3
+
+# --- CONNECTIONS ---
+# One writer task owns the only write connection; every write is queued to it
+# as a job and all jobs waiting at the same time share one transaction.
+# Reads go through a small pool of separate connections (WAL keeps them from
+# blocking the writer). aiosqlite runs each connection on its own thread, so
+# nothing here blocks the event loop.
+_write_queue = None
+_writer_task = None
+_writer_conn = None
+_readers = None
+
+async def _open(path):
+    c = await aiosqlite.connect(path, timeout=10)
+    await c.execute("PRAGMA journal_mode=WAL")
+    await c.execute("PRAGMA synchronous=NORMAL")
+    return c
+
+async def _writer_loop():
+    while True:
+        jobs = [await _write_queue.get()]
+        while not _write_queue.empty():
+            jobs.append(_write_queue.get_nowait())
+
+        results = []
+        try:
+            # One transaction for the batch; without it each savepoint would commit on its own
+            if not _writer_conn.in_transaction: await _writer_conn.execute("BEGIN")
+            for func, args, fut in jobs:
+                # A savepoint per job so a failing job doesn't leave half its writes
+                await _writer_conn.execute("SAVEPOINT job")
+                try:
+                    results.append((fut, await func(_writer_conn, *args), None))
+                    await _writer_conn.execute("RELEASE job")
+                except Exception as e:
+                    await _writer_conn.execute("ROLLBACK TO job")
+                    await _writer_conn.execute("RELEASE job")
+                    results.append((fut, None, e))
+            await _writer_conn.commit()
+        except Exception as e:
+            # Never let the writer task die: later write() calls would wait forever
+            logger.error(f"DB write batch failed: {e}")
+            try: await _writer_conn.rollback()
+            except Exception: pass
+            results = [(fut, None, e) for _, _, fut in jobs]
+
+        for fut, res, err in results:
+            if fut.done(): continue
+            if err: fut.set_exception(err)
+            else: fut.set_result(res)
+
+async def write(func, *args):
+    """Runs `await func(conn, *args)` on the writer connection and returns its result."""
+    fut = asyncio.get_running_loop().create_future()
+    await _write_queue.put((func, args, fut))
+    return await fut
+
+async def _noop(c):
+    pass
+
+async def execute(sql, params=()):
+    """Queues a single write statement."""
+    async def job(c):
+        await c.execute(sql, params)
+    await write(job)
+
+@asynccontextmanager
+async def reader():
+    """Borrows a read connection from the pool."""
+    c = await _readers.get()
+    try: yield c
+    finally: _readers.put_nowait(c)
+
+async def fetch_all(sql, params=()):
+    """Returns (columns, rows) for a read query."""
+    async with reader() as c:
+        async with c.execute(sql, params) as cur:
+            rows = await cur.fetchall()
+            return [d[0] for d in cur.description], rows
+
+async def init_db():
+    global _write_queue, _writer_task, _writer_conn, _readers
+    _writer_conn = await _open(DB_FILE)
+    c = _writer_conn
 
-def init_db():
     # Basic Table
-    cursor.execute('''CREATE TABLE IF NOT EXISTS users 
-                      (user_id INTEGER PRIMARY KEY, 
-                       session TEXT, 
-                       poke_list TEXT, 
+    await c.execute('''CREATE TABLE IF NOT EXISTS users
+                      (user_id INTEGER PRIMARY KEY,
+                       session TEXT,
+                       poke_list TEXT,
                        ball TEXT,
                        total_matched INTEGER DEFAULT 0,
                        total_caught INTEGER DEFAULT 0,
@@ -26,107 +115,363 @@ def init_db():
                        interval REAL DEFAULT 2.5,
                        schedule_time TEXT DEFAULT NULL,
                        schedule_active INTEGER DEFAULT 0)''')
-    
-    cursor.execute('''CREATE TABLE IF NOT EXISTS settings 
+
+    await c.execute('''CREATE TABLE IF NOT EXISTS settings
                       (key TEXT PRIMARY KEY, value TEXT)''')
-    
+
     # --- MIGRATIONS (Safe Updates) ---
-    try: cursor.execute("ALTER TABLE users ADD COLUMN interval REAL DEFAULT 2.5")
+    try: await c.execute("ALTER TABLE users ADD COLUMN interval REAL DEFAULT 2.5")
     except: pass
-    try: cursor.execute("ALTER TABLE users ADD COLUMN schedule_time TEXT DEFAULT NULL")
+    try: await c.execute("ALTER TABLE users ADD COLUMN schedule_time TEXT DEFAULT NULL")
     except: pass
-    try: cursor.execute("ALTER TABLE users ADD COLUMN schedule_active INTEGER DEFAULT 0")
+    try: await c.execute("ALTER TABLE users ADD COLUMN schedule_active INTEGER DEFAULT 0")
     except: pass
-    
+
     # Add Daily Columns if they don't exist
     for col in ['daily_matched', 'daily_caught', 'daily_fled', 'daily_shiny']:
-        try: cursor.execute(f"ALTER TABLE users ADD COLUMN {col} INTEGER DEFAULT 0")
+        try: await c.execute(f"ALTER TABLE users ADD COLUMN {col} INTEGER DEFAULT 0")
         except: pass
-    
-    conn.commit()
-
-def load_users():
-    cursor.execute("SELECT * FROM users")
-    rows = cursor.fetchall()
-    cols = [description[0] for description in cursor.description]
-    
+    # Stats day the daily columns count; older rows were last reset for today
+    try:
+        await c.execute("ALTER TABLE users ADD COLUMN daily_day TEXT DEFAULT NULL")
+        await c.execute("UPDATE users SET daily_day = ?", (today(),))
+    except: pass
+
+    # Last change time (unix seconds) for incremental backups, kept by triggers
+    try: await c.execute("ALTER TABLE users ADD COLUMN updated_at INTEGER DEFAULT 0")
+    except: pass
+    await c.execute('''CREATE TRIGGER IF NOT EXISTS users_touch_insert AFTER INSERT ON users
+                       WHEN NEW.updated_at IS NULL OR NEW.updated_at = 0
+                       BEGIN UPDATE users SET updated_at = CAST(strftime('%s', 'now') AS INTEGER)
+                             WHERE user_id = NEW.user_id; END''')
+    await c.execute('''CREATE TRIGGER IF NOT EXISTS users_touch_update AFTER UPDATE ON users
+                       WHEN NEW.updated_at IS OLD.updated_at
+                       BEGIN UPDATE users SET updated_at = CAST(strftime('%s', 'now') AS INTEGER)
+                             WHERE user_id = NEW.user_id; END''')
+    await c.execute("CREATE INDEX IF NOT EXISTS users_updated_at ON users (updated_at)")
+    await c.execute("CREATE INDEX IF NOT EXISTS users_total_caught ON users (total_caught)")
+
+    # Resolved peers (id + access hash) per account; access hashes are per account
+    await c.execute('''CREATE TABLE IF NOT EXISTS peers
+                      (user_id INTEGER, username TEXT, peer_id INTEGER, access_hash INTEGER,
+                       PRIMARY KEY (user_id, username))''')
+
+    # Catch history: raw events plus rollups kept up to date by every flush
+    await c.execute('''CREATE TABLE IF NOT EXISTS catch_events
+                      (id INTEGER PRIMARY KEY, user_id INTEGER, kind TEXT, species TEXT,
+                       level INTEGER, shiny INTEGER DEFAULT 0, ts INTEGER)''')
+    await c.execute("CREATE INDEX IF NOT EXISTS catch_events_user_kind ON catch_events (user_id, kind, ts)")
+    counts = ", ".join(f"{kind} INTEGER DEFAULT 0" for kind in STAT_KINDS)
+    await c.execute(f"CREATE TABLE IF NOT EXISTS daily_rollup (day TEXT, user_id INTEGER, {counts}, PRIMARY KEY (day, user_id))")
+    await c.execute("CREATE INDEX IF NOT EXISTS daily_rollup_caught ON daily_rollup (day, caught)")
+    await c.execute("CREATE INDEX IF NOT EXISTS daily_rollup_user ON daily_rollup (user_id, day)")
+    await c.execute(f"CREATE TABLE IF NOT EXISTS species_rollup (user_id INTEGER, species TEXT, {counts}, PRIMARY KEY (user_id, species))")
+    await c.execute("CREATE INDEX IF NOT EXISTS species_rollup_caught ON species_rollup (user_id, caught)")
+    await c.execute(f"CREATE TABLE IF NOT EXISTS hourly_rollup (user_id INTEGER, hour INTEGER, {counts}, PRIMARY KEY (user_id, hour))")
+    # Hours were once keyed on UTC, half an hour off the IST hours /rate shows
+    async with c.execute("SELECT 1 FROM hourly_rollup WHERE (hour + ?) % 3600 != 0 LIMIT 1", (IST_OFFSET,)) as cur:
+        if await cur.fetchone(): await _rebuild_hourly(c)
+    # scope 'all' holds the all-time sums, one row per stats day besides
+    await c.execute(f"CREATE TABLE IF NOT EXISTS totals (scope TEXT PRIMARY KEY, {counts})")
+    async with c.execute("SELECT 1 FROM totals WHERE scope = 'all'") as cur:
+        if not await cur.fetchone(): await _rebuild_totals(c)
+
+    await c.commit()
+
+    _readers = asyncio.Queue()
+    for _ in range(READ_POOL_SIZE):
+        _readers.put_nowait(await _open(DB_FILE))
+
+    _write_queue = asyncio.Queue()
+    _writer_task = asyncio.create_task(_writer_loop())
+
+async def close_db():
+    """Flushes pending stats and closes every connection."""
+    await flush_stats()
+    await write(_noop)  # Drains everything queued before us
+    _writer_task.cancel()
+    await _writer_conn.close()
+    while not _readers.empty():
+        await _readers.get_nowait().close()
+
+# --- USERS ---
+async def load_users(user_ids=None):
+    """Builds user_configs from the DB (only `user_ids` if given); returns the rows."""
+    cols, rows = await fetch_all("SELECT * FROM users")
+
     loaded_data = []
+    matchers = {}  # raw poke_list JSON -> matcher; most users share the default list
     for row in rows:
         data = dict(zip(cols, row))
         uid = data['user_id']
-        try: current_list = json.loads(data['poke_list'])
-        except: current_list = DEFAULT_LIST
-        
-        user_configs[uid] = {
-            'list': current_list, 
-            'ball': data['ball'], 
-            'hunting': False, 
-            'mode': 'STOPPED',
-            'interval': data.get('interval', DEFAULT_INTERVAL),
-            'schedule_time': data.get('schedule_time'),
-            'schedule_active': data.get('schedule_active', 0) == 1,
-            'stats': {
-                'total_caught': data['total_caught'], 
-                'total_fled': data['total_fled'], 
-                'total_matched': data['total_matched'],
-                'total_shiny': data.get('total_shiny', 0),
-                # Load Daily Stats
-                'daily_caught': data.get('daily_caught', 0),
-                'daily_fled': data.get('daily_fled', 0),
-                'daily_matched': data.get('daily_matched', 0),
-                'daily_shiny': data.get('daily_shiny', 0)
-            }, 
-            'notification_status': data['notification_status'], 
-            'group_id': data['group_id']
-        }
+        if user_ids is not None and uid not in user_ids: continue
+        raw = data['poke_list']
+        matcher = matchers.get(raw)
+        if matcher is None:
+            try: current_list = json.loads(raw)
+            except: current_list = DEFAULT_LIST
+            # Users with the same list share one compiled matcher (and its tuple)
+            matcher = matchers[raw] = get_matcher(current_list)
+
+        state = UserState(matcher, data['ball'],
+                          interval=data.get('interval', DEFAULT_INTERVAL),
+                          notification_status=data['notification_status'],
+                          group_id=data['group_id'],
+                          schedule_active=data.get('schedule_active', 0) == 1,
+                          schedule_time=data.get('schedule_time'))
+        for kind in STAT_KINDS:
+            # Totals plus the daily stats, if they are from today
+            state.set_counts(kind, data.get(f'total_{kind}') or 0, data.get(f'daily_{kind}') or 0, data.get('daily_day'))
+        user_configs[uid] = state
         loaded_data.append(data)
     return loaded_data
 
-def update_schedule(user_id, time_str, active):
+async def save_user(user_id, session, start_time):
+    """Creates (or replaces) a freshly logged-in user."""
+    await execute("INSERT OR REPLACE INTO users (user_id, session, poke_list, ball, start_time, interval) VALUES (?, ?, ?, ?, ?, ?)",
+                  (user_id, session, json.dumps(DEFAULT_LIST), "Safari Ball", start_time, DEFAULT_INTERVAL))
+
+async def get_session(user_id):
+    """A user's stored session string, or None."""
+    _, rows = await fetch_all("SELECT session FROM users WHERE user_id = ?", (user_id,))
+    return rows[0][0] if rows else None
+
+# --- BACKUPS ---
+# Zipped JSON lines: a header line with the column names, then one compact
+# array per user. Written straight from a DB cursor, so memory stays flat no
+# matter how many users there are.
+BACKUP_MEMBER = "hexabot_data.jsonl"
+LEGACY_BACKUP_MEMBER = "hexabot_data.json"  # older /fullexport: one indented list of dicts
+BACKUP_CHUNK = 500
+RESTORE_COLUMNS = {  # column -> default for backups that predate it
+    'user_id': None, 'session': None, 'poke_list': None, 'ball': "Safari Ball",
+    'total_matched': 0, 'total_caught': 0, 'total_fled': 0, 'total_shiny': 0,
+    'daily_matched': 0, 'daily_caught': 0, 'daily_fled': 0, 'daily_shiny': 0, 'daily_day': None,
+    'start_time': None, 'notification_status': 0, 'group_id': 0, 'interval': DEFAULT_INTERVAL,
+    'schedule_time': None, 'schedule_active': 0,
+}
+
+async def export_users(path, since=None):
+    """Streams users changed at or after `since` (unix seconds; None = all) into a
+    zip at `path`. Returns the number of users written."""
+    loop = asyncio.get_running_loop()
+    sql, params = "SELECT * FROM users", ()
+    if since is not None: sql, params = sql + " WHERE updated_at >= ?", (since,)
+    count = 0
+    async with reader() as c:
+        async with c.execute(sql, params) as cur:
+            cols = [d[0] for d in cur.description]
+            with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as z, z.open(BACKUP_MEMBER, "w") as out:
+                header = json.dumps({'columns': cols, 'since': since}) + "\n"
+                await loop.run_in_executor(None, out.write, header.encode())
+                while rows := await cur.fetchmany(BACKUP_CHUNK):
+                    chunk = "".join(json.dumps(r, separators=(',', ':')) + "\n" for r in rows)
+                    # Compression happens in the write; keep it off the loop
+                    await loop.run_in_executor(None, out.write, chunk.encode())
+                    count += len(rows)
+    return count
+
+def read_backup(path):
+    """Yields one dict per user from a backup zip (either format)."""
+    with zipfile.ZipFile(path) as z:
+        if BACKUP_MEMBER not in z.namelist():
+            with z.open(LEGACY_BACKUP_MEMBER) as f:
+                yield from json.load(f)
+            return
+        with z.open(BACKUP_MEMBER) as f:
+            cols = json.loads(f.readline())['columns']
+            for line in f:
+                yield dict(zip(cols, json.loads(line)))
+
+async def restore_users(path):
+    """Upserts every user in a backup zip with one executemany in one
+    transaction. Returns the restored user ids."""
+    restored = []
+    now = int(time.time())
+    def rows():
+        # Consumed on the DB thread, so the file is read as it is inserted
+        for u in read_backup(path):
+            restored.append(u['user_id'])
+            yield (*(u.get(col, default) for col, default in RESTORE_COLUMNS.items()), now)
+
+    # updated_at is set here so the insert trigger doesn't run per row
+    sql = (f"INSERT OR REPLACE INTO users ({', '.join(RESTORE_COLUMNS)}, updated_at) "
+           f"VALUES ({', '.join('?' * (len(RESTORE_COLUMNS) + 1))})")
+    async def job(c):
+        await c.executemany(sql, rows())
+        await _rebuild_totals(c)
+    await write(job)
+    return restored
+
+# --- SETTINGS ---
+async def get_setting(key, default=None):
+    _, rows = await fetch_all("SELECT value FROM settings WHERE key = ?", (key,))
+    return rows[0][0] if rows else default
+
+async def set_setting(key, value):
+    await execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, value))
+
+# --- PEER CACHE ---
+async def get_peer(user_id, username):
+    """(peer_id, access_hash) cached for this account, or None."""
+    _, rows = await fetch_all("SELECT peer_id, access_hash FROM peers WHERE user_id = ? AND username = ?",
+                              (user_id, username.lower()))
+    return rows[0] if rows else None
+
+async def save_peer(user_id, username, peer_id, access_hash):
+    await execute("INSERT OR REPLACE INTO peers (user_id, username, peer_id, access_hash) VALUES (?, ?, ?, ?)",
+                  (user_id, username.lower(), peer_id, access_hash))
+
+async def forget_peer(user_id, username):
+    await execute("DELETE FROM peers WHERE user_id = ? AND username = ?", (user_id, username.lower()))
+
+# --- SCHEDULES / INTERVALS ---
+async def update_schedule(user_id, time_str, active):
     active_int = 1 if active else 0
-    cursor.execute("UPDATE users SET schedule_time = ?, schedule_active = ? WHERE user_id = ?", 
-                   (time_str, active_int, user_id))
-    conn.commit()
     if user_id in user_configs:
-        user_configs[user_id]['schedule_time'] = time_str
-        user_configs[user_id]['schedule_active'] = active
+        user_configs[user_id].schedule_time = time_str
+        user_configs[user_id].schedule_active = active
+    await execute("UPDATE users SET schedule_time = ?, schedule_active = ? WHERE user_id = ?",
+                  (time_str, active_int, user_id))
+
+async def update_db_interval(user_id, interval):
+    await execute("UPDATE users SET interval = ? WHERE user_id = ?", (interval, user_id))
 
-def update_db_interval(user_id, interval):
-    cursor.execute("UPDATE users SET interval = ? WHERE user_id = ?", (interval, user_id))
-    conn.commit()
+# --- STATS WRITE-BEHIND ---
+# Counters are bumped in memory on the hot path; the deltas for all users,
+# plus the matching catch events and their rollups, are handed to the writer
+# as one job (one transaction) every few seconds.
+_pending_stats = {}   # (user_id, stats day) -> {kind: delta}
+_pending_events = []  # (user_id, kind, species, level, shiny, ts)
 
-def update_stat(user_id, column):
-    """Updates BOTH Total and Daily stats."""
-    valid_cols = ['matched', 'caught', 'fled', 'shiny']
+def update_stat(user_id, column, species=None, level=None, shiny=False):
+    """Updates BOTH Total and Daily stats (memory now, disk on next flush) and logs the event."""
     target_type = column.replace('total_', '')
-    
-    if target_type not in valid_cols: return
-
-    # Update DB: Increment Total AND Daily
-    daily_col = f"daily_{target_type}"
-    cursor.execute(f"UPDATE users SET {column} = {column} + 1, {daily_col} = {daily_col} + 1 WHERE user_id = ?", (user_id,))
-    conn.commit()
-    
+
+    if target_type not in STAT_KINDS: return
+
+    # Queue DB delta for the total and the day's count
+    deltas = _pending_stats.setdefault((user_id, today()), {})
+    deltas[target_type] = deltas.get(target_type, 0) + 1
+    _pending_events.append((user_id, target_type, species, level, int(shiny), int(time.time())))
+
     # Update Memory
     if user_id in user_configs:
-        user_configs[user_id]['stats'][column] += 1
-        # Initialize daily stat in memory if missing
-        if daily_col not in user_configs[user_id]['stats']:
-            user_configs[user_id]['stats'][daily_col] = 0
-        user_configs[user_id]['stats'][daily_col] += 1
-
-def reset_daily_stats():
-    """Resets only daily columns to 0."""
-    logger.info("Reseting Daily Stats...")
-    cursor.execute("UPDATE users SET daily_matched=0, daily_caught=0, daily_fled=0, daily_shiny=0")
-    conn.commit()
-    
-    # Update Memory
-    for uid in user_configs:
-        user_configs[uid]['stats']['daily_matched'] = 0
-        user_configs[uid]['stats']['daily_caught'] = 0
-        user_configs[uid]['stats']['daily_fled'] = 0
-        user_configs[uid]['stats']['daily_shiny'] = 0
+        user_configs[user_id].bump(target_type)
+
+async def _upsert_counts(c, table, keys, rows):
+    """Adds {key tuple: {kind: n}} onto a rollup table."""
+    kinds = ", ".join(STAT_KINDS)
+    marks = ", ".join("?" * (len(keys) + len(STAT_KINDS)))
+    adds = ", ".join(f"{k} = {k} + excluded.{k}" for k in STAT_KINDS)
+    await c.executemany(f"INSERT INTO {table} ({', '.join(keys)}, {kinds}) VALUES ({marks}) "
+                        f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {adds}",
+                        [(*key, *(n.get(k, 0) for k in STAT_KINDS)) for key, n in rows.items()])
+
+async def _rebuild_hourly(c):
+    """Recomputes the hourly rollup from the catch events, in IST hours."""
+    sums = ", ".join(f"SUM(kind = '{k}')" for k in STAT_KINDS)
+    await c.execute("DELETE FROM hourly_rollup")
+    await c.execute(f"INSERT INTO hourly_rollup (user_id, hour, {', '.join(STAT_KINDS)}) "
+                    f"SELECT user_id, ts - (ts + ?) % 3600, {sums} FROM catch_events GROUP BY 1, 2", (IST_OFFSET,))
+
+async def _rebuild_totals(c):
+    """Recomputes the all-time totals from the users table (first run, restore)."""
+    sums = ", ".join(f"COALESCE(SUM(total_{k}), 0)" for k in STAT_KINDS)
+    await c.execute(f"INSERT OR REPLACE INTO totals (scope, {', '.join(STAT_KINDS)}) SELECT 'all', {sums} FROM users")
+
+# Adds one (user, day) batch of deltas. Daily columns from an older day start
+# over from the delta; a delta for a day the row has already moved past only
+# counts toward the totals.
+_STATS_SQL = ("UPDATE users SET "
+              + ", ".join(f"total_{k} = total_{k} + :{k}" for k in STAT_KINDS) + ", "
+              + ", ".join(f"daily_{k} = CASE WHEN daily_day = :day THEN daily_{k} + :{k} "
+                          f"WHEN daily_day > :day THEN daily_{k} ELSE :{k} END" for k in STAT_KINDS)
+              + ", daily_day = MAX(COALESCE(daily_day, ''), :day) WHERE user_id = :uid")
+
+async def _write_stats(c, batch, events):
+    await c.executemany(_STATS_SQL, [{'uid': uid, 'day': day, **dict.fromkeys(STAT_KINDS, 0), **deltas}
+                                     for (uid, day), deltas in batch.items()])
+    if not events: return
+    await c.executemany("INSERT INTO catch_events (user_id, kind, species, level, shiny, ts) VALUES (?, ?, ?, ?, ?, ?)", events)
+
+    # Fold the batch into the rollups
+    daily, species, hourly, sums = {}, {}, {}, {}
+    for uid, kind, name, _, _, ts in events:
+        day = stats_day(ts)
+        for table, key in ((daily, (day, uid)), (hourly, (uid, ist_hour(ts))),
+                           (sums, ('all',)), (sums, (day,))):
+            n = table.setdefault(key, {})
+            n[kind] = n.get(kind, 0) + 1
+        if name:
+            n = species.setdefault((uid, name), {})
+            n[kind] = n.get(kind, 0) + 1
+    await _upsert_counts(c, 'daily_rollup', ('day', 'user_id'), daily)
+    await _upsert_counts(c, 'species_rollup', ('user_id', 'species'), species)
+    await _upsert_counts(c, 'hourly_rollup', ('user_id', 'hour'), hourly)
+    await _upsert_counts(c, 'totals', ('scope',), sums)
+
+async def flush_stats():
+    """Writes all pending stat deltas and events in a single transaction."""
+    global _pending_stats, _pending_events
+    if not _pending_stats and not _pending_events: return
+    batch, _pending_stats = _pending_stats, {}
+    events, _pending_events = _pending_events, []
+    try:
+        await write(_write_stats, batch, events)
+    except Exception as e:
+        logger.error(f"Stats flush failed, will retry: {e}")
+        # Put the deltas back so nothing is lost
+        for key, deltas in batch.items():
+            pending = _pending_stats.setdefault(key, {})
+            for kind, n in deltas.items():
+                pending[kind] = pending.get(kind, 0) + n
+        _pending_events[:0] = events
+
+async def stats_flusher():
+    """Background task: flushes stat deltas every STATS_FLUSH_INTERVAL seconds."""
+    while True:
+        await asyncio.sleep(STATS_FLUSH_INTERVAL)
+        await flush_stats()
+
+# --- HISTORY QUERIES ---
+# Each one is a primary-key or index range read on a rollup; nothing scans.
+async def leaderboard(day=None, limit=10):
+    """[(user_id, caught, shiny)] for one stats day, or all time."""
+    if day:
+        _, rows = await fetch_all("SELECT user_id, caught, shiny FROM daily_rollup WHERE day = ? "
+                                  "ORDER BY caught DESC LIMIT ?", (day, limit))
+    else:
+        _, rows = await fetch_all("SELECT user_id, total_caught, total_shiny FROM users "
+                                  "ORDER BY total_caught DESC LIMIT ?", (limit,))
+    return rows
+
+async def daily_history(user_id, days=7):
+    """[(day, matched, caught, fled, shiny)] for the user's last `days` stats days with activity, newest first."""
+    _, rows = await fetch_all(f"SELECT day, {', '.join(STAT_KINDS)} FROM daily_rollup WHERE user_id = ? "
+                              "ORDER BY day DESC LIMIT ?", (user_id, days))
+    return rows
+
+async def shiny_history(user_id, limit=10):
+    """[(species, level, ts)], newest first."""
+    _, rows = await fetch_all("SELECT species, level, ts FROM catch_events WHERE user_id = ? AND kind = 'shiny' "
+                              "ORDER BY ts DESC LIMIT ?", (user_id, limit))
+    return rows
+
+async def catch_rate(user_id, hours=24):
+    """[(hour start, matched, caught)] for the last `hours` hours that had activity."""
+    since = ist_hour(int(time.time())) - (hours - 1) * 3600
+    _, rows = await fetch_all("SELECT hour, matched, caught FROM hourly_rollup WHERE user_id = ? AND hour >= ? "
+                              "ORDER BY hour", (user_id, since))
+    return rows
 
-init_db()
+async def top_species(user_id, limit=10):
+    """[(species, caught, shiny)] by catches."""
+    _, rows = await fetch_all("SELECT species, caught, shiny FROM species_rollup WHERE user_id = ? AND caught > 0 "
+                              "ORDER BY caught DESC LIMIT ?", (user_id, limit))
+    return rows
 
+async def totals(scope='all'):
+    """{kind: n} for all time ('all') or one stats day."""
+    cols, rows = await fetch_all(f"SELECT {', '.join(STAT_KINDS)} FROM totals WHERE scope = ?", (scope,))
+    return dict(zip(cols, rows[0])) if rows else dict.fromkeys(STAT_KINDS, 0)
@@ -0,0 +1,153 @@
+import asyncio
+import heapq
+import itertools
+import time
+from telethon import errors
+from config import logger, GOVERNOR_RATE
+from metrics import metrics
+
+# --- OUTBOUND GOVERNOR ---
+# Every request to Telegram takes a token from its account's bucket for that
+# method class, then from the account's overall bucket, and (with
+# GOVERNOR_RATE set) from one shared by every account on the host. A
+# FloodWait pauses only the (account, class) bucket that hit it. Waiters are served by deadline: enqueue time plus the class's
+# head start, so a click on a live encounter goes ahead of a /hunt queued up
+# to three seconds earlier, but nothing waits behind newer work for longer than
+# its head start.
+
+# class -> (tokens per second, burst, head start in seconds)
+CLASSES = {
+    'click': (2.0, 3, 0.0),
+    'read': (2.0, 5, 0.5),
+    'hunt': (1.0, 1, 3.0),
+    'enter': (0.5, 1, 5.0),
+    'notify': (25.0, 30, 5.0),
+}
+ACCOUNT_LIMIT = (3.0, 5)  # per userbot, across classes
+MASTER_LIMIT = (30.0, 30)  # the master bot sends notifications only
+
+_seq = itertools.count()
+
+class Bucket:
+    __slots__ = ('rate', 'burst', 'tokens', 'stamp', 'paused_until', 'waiters', '_timer')
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.stamp = time.monotonic()
+        self.paused_until = 0.0
+        self.waiters = []  # heap of (deadline, seq, future, class)
+        self._timer = None
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + max(0.0, now - self.stamp) * self.rate)
+        self.stamp = max(self.stamp, now)
+
+    def pause(self, seconds):
+        """Hands out nothing for `seconds`, then one request before refilling at the normal rate."""
+        until = time.monotonic() + seconds
+        if until <= self.paused_until: return
+        self.paused_until = until
+        self.tokens = 1.0
+        self.stamp = until
+
+    async def take(self, deadline, cls):
+        now = time.monotonic()
+        if not self.waiters and now >= self.paused_until:
+            self._refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, (deadline, next(_seq), fut, cls))
+        self._schedule(now)
+        await fut
+
+    def _schedule(self, now):
+        if self._timer: return
+        if now < self.paused_until:
+            at = self.paused_until
+        else:
+            self._refill(now)
+            at = now + max(0.0, (1 - self.tokens) / self.rate)
+        self._timer = asyncio.get_running_loop().call_later(at - now, self._drain)
+
+    def _drain(self):
+        self._timer = None
+        now = time.monotonic()
+        if now >= self.paused_until:
+            self._refill(now)
+            while self.waiters and self.tokens >= 1:
+                fut = heapq.heappop(self.waiters)[2]
+                if fut.done(): continue  # Cancelled while waiting
+                self.tokens -= 1
+                fut.set_result(None)
+        while self.waiters and self.waiters[0][2].done(): heapq.heappop(self.waiters)
+        if self.waiters: self._schedule(now)
+
+    def depth(self):
+        """Live waiters per class."""
+        out = {}
+        for _, _, fut, cls in self.waiters:
+            if not fut.done(): out[cls] = out.get(cls, 0) + 1
+        return out
+
+class Governor:
+    def __init__(self, rate=GOVERNOR_RATE):
+        self.shared = Bucket(rate, max(1, int(rate))) if rate else None
+        self._buckets = {}  # (account, class or None) -> Bucket
+
+    def share(self, fraction):
+        """Scales the shared budget (each shard worker gets its part)."""
+        if not self.shared: return
+        self.shared.rate *= fraction
+        self.shared.burst = max(1, int(self.shared.burst * fraction))
+        self.shared.tokens = min(self.shared.tokens, self.shared.burst)
+
+    def _bucket(self, account, cls):
+        bucket = self._buckets.get((account, cls))
+        if bucket is None:
+            if cls: rate, burst, _ = CLASSES[cls]
+            else: rate, burst = MASTER_LIMIT if account == 'master' else ACCOUNT_LIMIT
+            bucket = self._buckets[(account, cls)] = Bucket(rate, burst)
+        return bucket
+
+    async def acquire(self, account, cls):
+        """Waits for a token for one `cls` request from `account`."""
+        start = time.monotonic()
+        deadline = start + CLASSES[cls][2]
+        await self._bucket(account, cls).take(deadline, cls)
+        await self._bucket(account, None).take(deadline, cls)
+        if self.shared: await self.shared.take(deadline, cls)
+        waited = time.monotonic() - start
+        if waited > 0.001: metrics.observe('governor_wait_seconds', waited, account)
+
+    def pause(self, account, cls, seconds):
+        self._bucket(account, cls).pause(seconds)
+
+    async def call(self, account, cls, func, *args, retries=1, **kwargs):
+        """Runs `await func(...)` under the governor. A FloodWait pauses this
+        account's `cls` bucket and the call is retried once the pause is over
+        (up to `retries` times, then the error is raised)."""
+        for attempt in range(retries + 1):
+            await self.acquire(account, cls)
+            try:
+                return await func(*args, **kwargs)
+            except errors.FloodWaitError as e:
+                metrics.inc('floodwait_seconds', account, e.seconds)
+                logger.warning(f"[GOVERNOR] {account} FloodWait {e.seconds}s on {cls}")
+                self.pause(account, cls, e.seconds)
+                if attempt == retries: raise
+
+    def status(self):
+        """Waiters per class at each stage (method, account, shared) and paused buckets, for /queues."""
+        now = time.monotonic()
+        out = {'method': {}, 'account': {}, 'shared': self.shared.depth() if self.shared else {}, 'paused': []}
+        for (account, cls), bucket in self._buckets.items():
+            stage = out['method' if cls else 'account']
+            for c, n in bucket.depth().items(): stage[c] = stage.get(c, 0) + n
+            if bucket.paused_until > now: out['paused'].append([account, cls or 'all', round(bucket.paused_until - now)])
+        return out
+
+governor = Governor()
@@ -0,0 +1,63 @@
+import asyncio
+import time
+from config import logger, user_clients, user_configs, user_tasks, HIBERNATE_AFTER
+import database as db
+from safari_client import idle_since, loops
+from admission import admission, PRIORITY_HIGH
+from metrics import metrics
+
+# --- HIBERNATION ---
+# Most accounts only hunt in a short daily window, but a connected userbot
+# holds its socket, session and update state all day. Clients that have not
+# been hunting for HIBERNATE_AFTER seconds are shut down and only the small
+# UserState stays loaded; a command or the scheduler's pre-wake (WAKE_LEAD
+# before the start) brings them back through the admission controller.
+
+SWEEP_INTERVAL = 60
+hibernating = set()  # user ids whose userbot is shut down until woken
+
+def hibernate(user_id):
+    """Shuts down a user's userbot; run_userbot's cleanup disconnects it."""
+    task = user_tasks.pop(user_id, None)
+    if task: task.cancel()
+    loops.stop(user_id)
+    user_clients.pop(user_id, None)
+    idle_since.pop(user_id, None)
+    hibernating.add(user_id)
+    metrics.inc('hibernations', user_id)
+
+def hibernate_idle(now=None):
+    """Hibernates every connected user idle for HIBERNATE_AFTER. Returns how many."""
+    cutoff = (now or time.monotonic()) - HIBERNATE_AFTER
+    idle = []
+    for uid, since in idle_since.items():
+        config = user_configs.get(uid)
+        if since <= cutoff and not (config and config.hunting): idle.append(uid)
+    for uid in idle: hibernate(uid)
+    if idle: logger.info(f"[HIBERNATE] {len(idle)} idle userbots disconnected, {len(hibernating)} hibernating")
+    return len(idle)
+
+async def hibernation_sweeper():
+    if not HIBERNATE_AFTER: return
+    while True:
+        await asyncio.sleep(SWEEP_INTERVAL)
+        hibernate_idle()
+
+async def wake(user_id, callback, priority=PRIORITY_HIGH):
+    """Reconnects a hibernated user's userbot and waits until it is live.
+
+    Returns None if they were not hibernating, otherwise the admission
+    outcome ('connected', 'expired' or 'failed').
+    """
+    if user_id not in hibernating: return None
+    hibernating.discard(user_id)
+    session = await db.get_session(user_id)
+    if session is None: return 'failed'
+    t0 = time.monotonic()
+    outcome = await admission.admit(user_id, session, callback, priority)
+    took = time.monotonic() - t0
+    if outcome == 'connected': metrics.observe('rehydrate_seconds', took, user_id)
+    # Still asleep as far as anyone can tell, so the next command or schedule retries
+    if outcome == 'failed': hibernating.add(user_id)
+    logger.info(f"[HIBERNATE] {user_id} woke in {took:.2f}s ({outcome})")
+    return outcome
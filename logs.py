@@ -0,0 +1,129 @@
+import atexit
+import glob
+import io
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import zipfile
+from datetime import date
+
+# --- LOG PIPELINE ---
+# Logging calls on the event loop only put the record on a queue; a listener
+# thread does the formatting and the file/console writes. The file rotates by
+# size and at local midnight, keeping numbered backups (.1 is the newest).
+
+FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+class RotatingLogHandler(logging.handlers.RotatingFileHandler):
+    """RotatingFileHandler that also rolls over when the day changes."""
+
+    def __init__(self, filename, max_bytes, backups):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backups, encoding='utf-8')
+        self._day = date.today()
+
+    def shouldRollover(self, record):
+        if date.today() != self._day: return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        self._day = date.today()
+
+class SampleFilter(logging.Filter):
+    """Lets through 1 in `every` records starting with `prefix`, counted per user.
+
+    The user id is the word right after the prefix ("[WAIT] 123 sleeping...").
+    """
+
+    def __init__(self, prefix, every):
+        super().__init__()
+        self.prefix = prefix
+        self.every = every
+        self._counts = {}
+
+    def filter(self, record):
+        msg = record.msg
+        if self.every <= 1 or not isinstance(msg, str) or not msg.startswith(self.prefix): return True
+        user = msg[len(self.prefix):].split(' ', 1)[0]
+        n = self._counts.get(user, 0)
+        self._counts[user] = n + 1
+        return n % self.every == 0
+
+def setup_logging(path, max_bytes, backups, wait_sample=1):
+    """Routes the root logger through a queue to a rotating file and the console."""
+    formatter = logging.Formatter(FORMAT)
+    file_handler = RotatingLogHandler(path, max_bytes, backups)
+    console = logging.StreamHandler()
+    for h in (file_handler, console): h.setFormatter(formatter)
+
+    records = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(records)
+    queue_handler.addFilter(SampleFilter("[WAIT] ", wait_sample))
+    listener = logging.handlers.QueueListener(records, file_handler, console)
+
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.handlers[:] = [queue_handler]
+    listener.start()
+    # Drains whatever is still queued on the way out
+    atexit.register(listener.stop)
+    return listener
+
+# --- /log EXPORTS ---
+# Blocking file work; callers run these in an executor.
+def log_files(path):
+    """Every log file for `path` (shard logs and rotated backups too), oldest first."""
+    base, ext = os.path.splitext(path)
+    files = set(glob.glob(f"{glob.escape(base)}*{ext}")) | set(glob.glob(f"{glob.escape(base)}*{ext}.*"))
+
+    def order(f):
+        # Rotated backups (.N) are older than the live file; higher N is older
+        stem, _, n = f.rpartition('.')
+        return (stem, -int(n)) if n.isdigit() else (f, 0)
+    return sorted(files, key=order)
+
+def tail_lines(path, n, block=64 * 1024):
+    """Last `n` lines of a file without reading all of it."""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        pos, data = f.tell(), b""
+        while pos > 0 and data.count(b"\n") <= n:
+            step = min(block, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+    return data.decode('utf-8', 'replace').splitlines(keepends=True)[-n:]
+
+def user_lines(path, user_id):
+    """Lines mentioning `user_id` as a whole word."""
+    pattern = re.compile(rf"(?<!\d){user_id}(?!\d)")
+    with open(path, encoding='utf-8', errors='replace') as f:
+        return [line for line in f if pattern.search(line)]
+
+def build_log_zip(path, mode='tail', tail=2000, user_id=None):
+    """Zips the logs for /log: `tail` lines of each live file, one user's lines, or the live files whole.
+
+    Returns a BytesIO (empty name) or None when there is nothing to send.
+    """
+    files = log_files(path)
+    if mode != 'user': files = [f for f in files if not f.rpartition('.')[2].isdigit()]
+    buffer = io.BytesIO()
+    wrote = False
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as z:
+        if mode == 'user':
+            lines = [line for f in files for line in user_lines(f, user_id)]
+            # Interleave the master and shard logs by their timestamp prefix
+            lines.sort(key=lambda line: line[:23])
+            if lines:
+                z.writestr(f"user_{user_id}.log", "".join(lines))
+                wrote = True
+        else:
+            for f in files:
+                if mode == 'full': z.write(f, os.path.basename(f))
+                else: z.writestr(os.path.basename(f), "".join(tail_lines(f, tail)))
+                wrote = True
+    if not wrote: return None
+    buffer.seek(0)
+    return buffer
@@ -1,42 +1,73 @@
 import asyncio
+import functools
 import os
-import io
-import zipfile
-import json
-from datetime import datetime
+import tempfile
+import time
+from datetime import datetime, timedelta
 from telethon import TelegramClient, events
 from telethon.sessions import StringSession
 from telethon.errors import SessionPasswordNeededError
 
 from config import *
 import database as db
-from safari_client import run_userbot, auto_enter_loop
+from media import prepare_media, remember_media, forget_media, MEDIA_ERRORS
+from notifier import Notifier
+from shards import Supervisor, local_op
+from scheduler import DailyScheduler
+from metrics import metrics, merge_snapshots, render_summary, serve_prometheus
+from hibernation import hibernation_sweeper
+from governor import governor, CLASSES
+from perf import perf, time_handlers, TOP_N
+from state import UserState
+from logs import build_log_zip
 
-# Initialize Master Bot
-master = TelegramClient('master_bot', API_ID, API_HASH).start(bot_token=BOT_TOKEN)
+# Initialize Master Bot (logged in by main())
+master = TelegramClient('master_bot', API_ID, API_HASH)
 
 # --- NOTIFICATION CALLBACK ---
-async def notify_user(user_id, message, file_path=None):
-    """Callback passed to userbot to send alerts via Master Bot."""
-    try:
-        config = user_configs.get(user_id)
-        if not config: return
+async def deliver_alert(user_id, message, media=None):
+    """Sends one (possibly merged) alert to the user and their group."""
+    config = user_configs.get(user_id)
+    if not config: return
+
+    # DM User (+ Group Notification)
+    chats = [user_id]
+    if config.notification_status == 1 and config.group_id:
+        chats.append(config.group_id)
 
-        # DM User
+    # Upload the image once; later recipients reuse the sent media
+    file = None
+    if media:
+        try: file = await prepare_media(master, media)
+        except Exception as e: logger.error(f"Media Error: {e}")
+
+    for chat in chats:
         try:
-            if file_path: await master.send_file(user_id, file_path, caption=message)
-            else: await master.send_message(user_id, message)
-        except: pass
-
-        # Group Notification
-        if config.get('notification_status') == 1 and config.get('group_id'):
-            gid = config['group_id']
-            try:
-                if file_path: await master.send_file(gid, file_path, caption=message)
-                else: await master.send_message(gid, message)
-            except: pass
-    except Exception as e:
-        logger.error(f"Notify Error: {e}")
+            if file is None: await notifier.call(chat, master.send_message, chat, message)
+            else:
+                sent = await notifier.call(chat, master.send_file, chat, file, caption=message)
+                file = remember_media(media, sent) or file
+        except Exception as e:
+            logger.error(f"Notify Error ({chat}): {e}")
+            if media and isinstance(e, MEDIA_ERRORS): forget_media(media)
+
+notifier = Notifier(deliver_alert)
+
+async def notify_user(user_id, message, media=None):
+    """Callback passed to userbot; only queues the alert, never waits on sending."""
+    notifier.enqueue(user_id, message, media)
+
+supervisor = None  # Set in main() when running sharded
+
+async def run_op(uid, op, **kwargs):
+    """Runs a per-user operation here, or on the shard that owns the user."""
+    if supervisor: return await supervisor.call(uid, op, **kwargs)
+    return await local_op(op, uid, notify_user, **kwargs)
+
+async def run_all(op, **kwargs):
+    """Runs an operation for every user; returns one result per shard."""
+    if supervisor: return await supervisor.broadcast(op, **kwargs)
+    return [await local_op(op, None, notify_user, **kwargs)]
 
 # ================= USER COMMANDS =================
 
@@ -45,13 +76,9 @@ async def start_safari(event):
     uid = event.sender_id
     if uid not in user_configs: return await event.reply("Please /login first.")
     
-    user_configs[uid]['hunting'] = True
-    user_configs[uid]['mode'] = 'SAFARI_INIT'
-    
     # Trigger auto-enter loop
-    if uid in user_clients:
-        asyncio.create_task(auto_enter_loop(user_clients[uid], uid))
-        await event.reply(f"**Safari Started!**\nTimer: `{user_configs[uid].get('interval', DEFAULT_INTERVAL)}s`")
+    if await run_op(uid, 'start'):
+        await event.reply(f"**Safari Started!**\nTimer: `{user_configs[uid].interval}s`")
     else:
         await event.reply("(!) Client not connected. Try /login again.")
 
@@ -59,8 +86,7 @@ async def start_safari(event):
 async def stop_safari(event):
     uid = event.sender_id
     if uid in user_configs:
-        user_configs[uid]['hunting'] = False
-        user_configs[uid]['mode'] = 'STOPPED'
+        await run_op(uid, 'stop')
         await event.reply("Safari Stopped.")
 
 @master.on(events.NewMessage(pattern=r'/timer (?P<val>\d+(\.\d+)?)'))
@@ -72,8 +98,9 @@ async def set_timer(event):
         val = float(event.pattern_match.group('val'))
         if val < 1.0: return await event.reply("Minimum timer is 1.0s")
         
-        user_configs[uid]['interval'] = val
-        db.update_db_interval(uid, val)
+        user_configs[uid].interval = val
+        await run_op(uid, 'interval', value=val)
+        await db.update_db_interval(uid, val)
         await event.reply(f"✅ **Timer Updated!**\nNew Interval: `{val} seconds`")
     except ValueError:
         await event.reply("Invalid number.")
@@ -88,7 +115,8 @@ async def set_schedule(event):
     
     # Handle OFF
     if input_str.lower() == 'off':
-        db.update_schedule(uid, None, False)
+        await db.update_schedule(uid, None, False)
+        schedule_user(uid)
         return await event.reply("🔕 **Schedule Disabled.**")
         
     # Handle Time Set
@@ -97,7 +125,8 @@ async def set_schedule(event):
         dt = datetime.strptime(input_str.upper(), "%I:%M %p")
         time_fmt = dt.strftime("%I:%M %p") # Normalize format
         
-        db.update_schedule(uid, time_fmt, True)
+        await db.update_schedule(uid, time_fmt, True)
+        schedule_user(uid)
         
         await event.reply(f"⏰ **Schedule Set!**\n"
                           f"Bot will auto-start daily at: `{time_fmt}` (IST)\n"
@@ -110,16 +139,81 @@ async def info(event):
     uid = event.sender_id
     if uid not in user_configs: return
     c = user_configs[uid]
+    live = await run_op(uid, 'info') or {'hunting': False, 'stats': c.stats(), 'loops': {}, 'pacing': None}
+    loop_info = " | ".join(f"{role}: {state}" for role, state in sorted(live['loops'].items())) or "none"
+    p = live['pacing']
+    if p and p['sent']:
+        cooldown = f"{p['cooldown_lo']:.1f}-{p['cooldown']:.1f}s" if p['cooldown'] is not None else "learning"
+        pace_info = f"cooldown {cooldown}, reply {p['latency_ms']}ms, rejected {p['rejected']}/{p['sent']}"
+    else:
+        pace_info = "no hunts yet"
+    conn = live.get('conn')
+    conn_info = "no drops"
+    if live.get('hibernating'): conn_info = "💤 hibernating (wakes on /safari or schedule)"
+    elif conn:
+        conn_info = f"{conn['reconnects']} reconnects, {conn['downtime']:.0f}s offline"
+        if conn['down_since']: conn_info = f"⚠️ offline since {datetime.fromtimestamp(conn['down_since'], IST).strftime('%I:%M %p')}, " + conn_info
     
-    sched_info = f"{c.get('schedule_time')} [ON]" if c.get('schedule_active') else "OFF"
+    sched_info = f"{c.schedule_time} [ON]" if c.schedule_active else "OFF"
     
     msg = (f"**User Status**\n"
-           f"State: {'🟢 Active' if c['hunting'] else '🔴 Stopped'}\n"
-           f"Timer: `{c.get('interval', DEFAULT_INTERVAL)}s`\n"
+           f"State: {'🟢 Active' if live['hunting'] else '🔴 Stopped'}\n"
+           f"Timer: `{c.interval}s`\n"
            f"Schedule: `{sched_info}`\n"
-           f"Matched: {c['stats']['total_matched']} | Shiny: {c['stats']['total_shiny']}")
+           f"Loops: `{loop_info}`\n"
+           f"Pacing: `{pace_info}`\n"
+           f"Connection: `{conn_info}`\n"
+           f"Matched: {live['stats']['total_matched']} | Shiny: {live['stats']['total_shiny']}")
     await event.reply(msg)
 
+@master.on(events.NewMessage(pattern='/shinies'))
+async def shinies(event):
+    """Your last 10 shiny encounters."""
+    uid = event.sender_id
+    if uid not in user_configs: return
+    rows = await db.shiny_history(uid)
+    if not rows: return await event.reply("No shinies yet.")
+    lines = [f"✨ {species}{f' (Lv. {level})' if level else ''} — "
+             f"{datetime.fromtimestamp(ts, IST).strftime('%d %b %I:%M %p')}" for species, level, ts in rows]
+    await event.reply("**Shiny History**\n" + "\n".join(lines))
+
+@master.on(events.NewMessage(pattern='/rate'))
+async def rate(event):
+    """Targets matched and caught per hour over the last day."""
+    uid = event.sender_id
+    if uid not in user_configs: return
+    rows = await db.catch_rate(uid)
+    if not rows: return await event.reply("No hunts in the last 24 hours.")
+    matched = sum(r[1] for r in rows)
+    caught = sum(r[2] for r in rows)
+    lines = [f"`{datetime.fromtimestamp(hour, IST).strftime('%d %b %H:00')}` {c} caught / {m} matched"
+             for hour, m, c in rows]
+    await event.reply(f"**Catch Rate (24h)**\n" + "\n".join(lines) +
+                      f"\n━━━━━━━━━━━━━━━━━━\n{caught} caught / {matched} matched "
+                      f"({caught / matched * 100 if matched else 0:.0f}%), {caught / len(rows):.1f}/active hour")
+
+@master.on(events.NewMessage(pattern='/species'))
+async def species(event):
+    """Your most caught species."""
+    uid = event.sender_id
+    if uid not in user_configs: return
+    rows = await db.top_species(uid)
+    if not rows: return await event.reply("No catches yet.")
+    lines = [f"{i}. {name} — {caught}{f' ({shiny} ✨)' if shiny else ''}" for i, (name, caught, shiny) in enumerate(rows, 1)]
+    await event.reply("**Top Species**\n" + "\n".join(lines))
+
+@master.on(events.NewMessage(pattern='/history'))
+async def history(event):
+    """Your counts for each of the last 7 stats days."""
+    uid = event.sender_id
+    if uid not in user_configs: return
+    rows = await db.daily_history(uid)
+    if not rows: return await event.reply("No hunts yet.")
+    lines = [f"`{datetime.strptime(day, '%Y-%m-%d').strftime('%d %b')}` {caught} caught / {matched} matched"
+             f"{f', {fled} fled' if fled else ''}{f', {shiny} ✨' if shiny else ''}"
+             for day, matched, caught, fled, shiny in rows]
+    await event.reply("**Daily History**\n" + "\n".join(lines))
+
 @master.on(events.NewMessage(pattern='/slogin'))
 async def string_login(event):
     uid = event.sender_id
@@ -143,22 +237,10 @@ async def string_login(event):
         me = await client.get_me()
         await client.disconnect()
         
-        cursor = db.conn.cursor()
-        now = datetime.now().isoformat()
-        cursor.execute("INSERT OR REPLACE INTO users (user_id, session, poke_list, ball, start_time, interval) VALUES (?, ?, ?, ?, ?, ?)", 
-                       (uid, session_str, json.dumps(DEFAULT_LIST), "Safari Ball", now, DEFAULT_INTERVAL))
-        db.conn.commit()
-        
-        user_configs[uid] = {
-            'list': DEFAULT_LIST, 'ball': "Safari Ball", 
-            'hunting': False, 'mode': 'STOPPED', 'interval': DEFAULT_INTERVAL,
-            'stats': {'total_caught': 0, 'total_fled': 0, 'total_matched': 0, 'total_shiny': 0},
-            'notification_status': 0, 'group_id': 0,
-            'schedule_active': False, 'schedule_time': None
-        }
+        await db.save_user(uid, session_str, datetime.now().isoformat())
         
-        task = asyncio.create_task(run_userbot(uid, session_str, notify_user))
-        user_tasks[uid] = task
+        user_configs[uid] = UserState()
+        await run_op(uid, 'login', session=session_str)
         
         await msg.edit(f"✅ **Login Success!**\nWelcome, {me.first_name}.")
         
@@ -190,22 +272,10 @@ async def otp_login(event):
             return await conv.send_message(f"Error: {e}")
             
         sess = client.session.save()
-        cursor = db.conn.cursor()
-        now = datetime.now().isoformat()
-        cursor.execute("INSERT OR REPLACE INTO users (user_id, session, poke_list, ball, start_time, interval) VALUES (?, ?, ?, ?, ?, ?)", 
-                       (sender, sess, json.dumps(DEFAULT_LIST), "Safari Ball", now, DEFAULT_INTERVAL))
-        db.conn.commit()
+        await db.save_user(sender, sess, datetime.now().isoformat())
         
-        user_configs[sender] = {
-            'list': DEFAULT_LIST, 'ball': "Safari Ball", 
-            'hunting': False, 'mode': 'STOPPED', 'interval': DEFAULT_INTERVAL,
-            'stats': {'total_caught': 0, 'total_fled': 0, 'total_matched': 0, 'total_shiny': 0},
-            'notification_status': 0, 'group_id': 0,
-            'schedule_active': False, 'schedule_time': None
-        }
-        
-        task = asyncio.create_task(run_userbot(sender, sess, notify_user))
-        user_tasks[sender] = task
+        user_configs[sender] = UserState()
+        await run_op(sender, 'login', session=sess)
         await conv.send_message("✅ **Logged in!**")
 
 # ================= ADMIN/OWNER COMMANDS =================
@@ -214,64 +284,181 @@ async def otp_login(event):
 async def global_stats(event):
     if event.sender_id != OWNER_ID: return
     
-    total_users = len(user_configs)
-    active_users = sum(1 for u in user_configs.values() if u['hunting'])
-    total_caught = sum(u['stats']['total_caught'] for u in user_configs.values())
+    # Each shard sums its own users
+    parts = await run_all('summary')
+    total_users = sum(p['users'] for p in parts)
+    active_users = sum(p['active'] for p in parts)
+    asleep = sum(p.get('hibernating', 0) for p in parts)
+    # Catch counts come from the rollups, not from summing every user
+    all_time = await db.totals()
+    today = await db.totals(db.stats_day(time.time()))
     
     msg = (f"≡ **Global Admin Stats**\n"
            f"━━━━━━━━━━━━━━━━━━\n"
            f"» **Total Users:** {total_users}\n"
            f"» **Active Hunters:** {active_users}\n"
-           f"» **Total Catches:** {total_caught}")
+           f"» **Hibernating:** {asleep}\n"
+           f"» **Total Catches:** {all_time['caught']} (today {today['caught']})\n"
+           f"» **Shinies:** {all_time['shiny']} (today {today['shiny']})")
     await event.reply(msg)
 
+@master.on(events.NewMessage(pattern=r'/top(?: (?P<scope>today|all))?$'))
+async def top_hunters(event):
+    """/top [today|all]: catch leaderboard."""
+    if event.sender_id != OWNER_ID: return
+    today = event.pattern_match.group('scope') == 'today'
+    rows = await db.leaderboard(db.stats_day(time.time()) if today else None)
+    if not rows: return await event.reply("No catches yet.")
+    lines = [f"{i}. `{uid}` — {caught} caught, {shiny} ✨" for i, (uid, caught, shiny) in enumerate(rows, 1)]
+    await event.reply(f"🏆 **Top Hunters ({'Today' if today else 'All Time'})**\n━━━━━━━━━━━━━━━━━━\n" + "\n".join(lines))
+
 @master.on(events.NewMessage(pattern='/allsafari'))
 async def force_start_all(event):
     if event.sender_id != OWNER_ID: return
-    count = 0
-    for uid, config in user_configs.items():
-        if not config['hunting']:
-            config['hunting'] = True
-            config['mode'] = 'SAFARI_INIT'
-            count += 1
-            if uid in user_clients:
-                asyncio.create_task(auto_enter_loop(user_clients[uid], uid))
+    count = sum(await run_all('allstart'))
     await event.reply(f"🚀 **Force Started:** {count} bots.")
 
 @master.on(events.NewMessage(pattern='/allexit'))
 async def force_stop_all(event):
     if event.sender_id != OWNER_ID: return
-    count = 0
-    for config in user_configs.values():
-        if config['hunting']:
-            config['hunting'] = False
-            config['mode'] = 'STOPPED'
-            count += 1
+    count = sum(await run_all('allstop'))
     await event.reply(f"🛑 **Force Stopped:** {count} bots.")
 
-@master.on(events.NewMessage(pattern='/log'))
-async def get_log(event):
+@master.on(events.NewMessage(pattern='/startup'))
+async def startup_status(event):
+    if event.sender_id != OWNER_ID: return
+    parts = await run_all('startup')
+    total = sum(p['total'] for p in parts)
+    connected = sum(p['connected'] for p in parts)
+    pending = sum(p['pending'] for p in parts)
+    failed = sum(p['failed'] for p in parts) + sum(p['expired'] for p in parts)
+    state = "✅ Done" if all(p['finished'] for p in parts) else "⏳ Connecting"
+    await event.reply(f"🔌 **Startup:** {state}\n"
+                      f"» Connected: {connected}/{total}\n"
+                      f"» Pending: {pending} | Failed/Expired: {failed}\n"
+                      f"» Elapsed: {max(p['elapsed'] for p in parts)}s")
+
+@master.on(events.NewMessage(pattern='/queues'))
+async def queue_status(event):
+    """Rate governor queue depths and FloodWait pauses, across every process."""
     if event.sender_id != OWNER_ID: return
-    if os.path.exists(LOG_FILE):
-        await event.reply(file=LOG_FILE, message="📄 **System Log File**")
+    parts = (await run_all('queues') if supervisor else []) + [governor.status()]
+
+    def stage(name):
+        return " | ".join(f"{cls} {sum(p[name].get(cls, 0) for p in parts)}" for cls in CLASSES)
+    paused = [p for part in parts for p in part['paused']]
+    paused_info = ", ".join(f"{acc} {cls} {secs}s" for acc, cls, secs in paused[:10]) or "none"
+    if len(paused) > 10: paused_info += f" (+{len(paused) - 10} more)"
+    await event.reply(f"🚦 **Outbound Queues**\n"
+                      f"» Method budget: `{stage('method')}`\n"
+                      f"» Account budget: `{stage('account')}`\n"
+                      f"» Shared budget: `{stage('shared')}`\n"
+                      f"» Alert digests queued: {notifier.depth()}\n"
+                      f"» FloodWait pauses: {paused_info}")
+
+@master.on(events.NewMessage(pattern=r'/perf(?: (?P<profile>profile))?(?: (?P<n>\d+))?$'))
+async def perf_report(event):
+    """/perf [n]: loop lag, stalls and the n slowest phases | /perf profile [seconds]: sample first."""
+    if event.sender_id != OWNER_ID: return
+    n = int(event.pattern_match.group('n') or 0)
+    top = TOP_N
+    if event.pattern_match.group('profile'):
+        seconds = perf.profile(n or 10)
+        if supervisor: await run_all('perf_profile', seconds=seconds)
+        msg = await event.reply(f"⏱ Profiling for {seconds}s...")
+        await asyncio.sleep(seconds + 0.5)
     else:
-        await event.reply("(!) Log file empty or missing.")
+        top = n or TOP_N
+        msg = None
+
+    # The master's own loop, then each shard's
+    parts = [("master" if supervisor else "loop", perf.report(top))]
+    if supervisor: parts += [(f"shard {i}", r) for i, r in enumerate(await run_all('perf', top=top))]
+
+    lines = ["⏱ **Performance**", "**Loop lag (last minute):**"]
+    lines += [f"» {name}: p50 {r['lag']['p50'] * 1000:.0f} ms | p99 {r['lag']['p99'] * 1000:.0f} ms | "
+              f"max {r['lag']['max'] * 1000:.0f} ms" for name, r in parts]
+    stalls = sorted(((ts, secs, where, name) for name, r in parts for ts, secs, where in r['stalls']), reverse=True)
+    if stalls:
+        lines.append("**Recent stalls:**")
+        lines += [f"» `{datetime.fromtimestamp(ts, IST).strftime('%H:%M:%S')}` {name} {secs * 1000:.0f} ms in `{where}`"
+                  for ts, secs, where, name in stalls[:top]]
+
+    phases = {}
+    for _, r in parts:
+        for name, count, total, worst in r['phases']:
+            p = phases.setdefault(name, [0, 0.0, 0.0])
+            p[0] += count
+            p[1] += total
+            p[2] = max(p[2], worst)
+    lines.append("**Slowest phases (time on the loop):**")
+    for name, (count, total, worst) in sorted(phases.items(), key=lambda kv: kv[1][1], reverse=True)[:top]:
+        lines.append(f"» `{name}` n={count} total {total:.1f}s avg {total / count * 1000:.2f} ms max {worst * 1000:.0f} ms")
+
+    samples = sum(r['profile']['samples'] for _, r in parts)
+    if samples:
+        own, inclusive = {}, {}
+        for _, r in parts:
+            for src, dst in ((r['profile']['own'], own), (r['profile']['inclusive'], inclusive)):
+                for func, k in src.items(): dst[func] = dst.get(func, 0) + k
+        idle = own.pop('<idle>', 0)
+        lines.append(f"**Profile ({samples} samples, {idle / samples * 100:.0f}% idle):**")
+        lines += [f"» self {k / samples * 100:4.1f}% `{func}`" for func, k in sorted(own.items(), key=lambda kv: -kv[1])[:top]]
+        lines += [f"» total {k / samples * 100:4.1f}% `{func}`" for func, k in sorted(inclusive.items(), key=lambda kv: -kv[1])[:top]]
+
+    text = "\n".join(lines)
+    if msg: await msg.edit(text)
+    else: await event.reply(text)
 
-@master.on(events.NewMessage(pattern='/fullexport'))
+async def metrics_snapshot():
+    """Metrics from every process (the master's own notifier included)."""
+    parts = await run_all('metrics') if supervisor else []
+    return merge_snapshots(parts + [metrics.snapshot()])
+
+@master.on(events.NewMessage(pattern=r'/metrics(?: (?P<uid>\d+))?$'))
+async def show_metrics(event):
+    if event.sender_id != OWNER_ID: return
+    uid = event.pattern_match.group('uid')
+    title = f"User {uid}" if uid else "Global"
+    summary = render_summary(await metrics_snapshot(), int(uid) if uid else None)
+    await event.reply(f"📈 **Metrics ({title})**\n━━━━━━━━━━━━━━━━━━\n{summary}")
+
+@master.on(events.NewMessage(pattern=r'/log(?: (?P<arg>\S+))?$'))
+async def get_log(event):
+    """/log: zipped tail of each log | /log <uid>: that user's lines | /log full: whole live files."""
+    if event.sender_id != OWNER_ID: return
+    arg = event.pattern_match.group('arg')
+    if arg and arg.isdigit(): mode, title = 'user', f"User {arg} Log Extract"
+    elif arg == 'full': mode, title = 'full', "Full Log Files"
+    else: mode, title = 'tail', f"Log Tail ({LOG_TAIL_LINES} lines)"
+
+    # Reading and zipping the files happens off the event loop
+    loop = asyncio.get_running_loop()
+    buffer = await loop.run_in_executor(None, functools.partial(
+        build_log_zip, LOG_FILE, mode, LOG_TAIL_LINES, int(arg) if mode == 'user' else None))
+    if not buffer: return await event.reply("(!) Log file empty or missing.")
+    buffer.name = f"logs_{mode}_{datetime.now().strftime('%Y%m%d_%H%M')}.zip"
+    await event.reply(f"📄 **{title}**", file=buffer)
+
+@master.on(events.NewMessage(pattern=r'/fullexport(?: (?P<mode>inc))?$'))
 async def backup_db(event):
+    """/fullexport: every user | /fullexport inc: only users changed since the last backup."""
     if event.sender_id != OWNER_ID: return
-    cursor = db.conn.cursor()
-    cursor.execute("SELECT * FROM users")
-    columns = [description[0] for description in cursor.description]
-    rows = cursor.fetchall()
-    data = [dict(zip(columns, row)) for row in rows]
-    json_data = json.dumps(data, indent=4)
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
-        zip_file.writestr("hexabot_data.json", json_data)
-    zip_buffer.seek(0)
-    zip_buffer.name = f"backup_{datetime.now().strftime('%Y%m%d')}.zip"
-    await event.reply("💾 **Database Backup:**", file=zip_buffer)
+    since = None
+    if event.pattern_match.group('mode'):
+        last = await db.get_setting('last_backup_at')
+        since = int(last) if last else None  # No earlier backup: take everything
+    started = int(time.time())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        kind = "inc" if since is not None else "full"
+        path = os.path.join(tmp, f"backup_{kind}_{datetime.now().strftime('%Y%m%d_%H%M')}.zip")
+        count = await db.export_users(path, since)
+        await db.set_setting('last_backup_at', str(started))
+        title = (f"Incremental Backup:** {count} users changed since "
+                 f"{datetime.fromtimestamp(since, IST).strftime('%d %b %I:%M %p')}" if since is not None
+                 else f"Database Backup:** {count} users")
+        await event.reply(f"💾 **{title}", file=path)
 
 @master.on(events.NewMessage(pattern='/fullimport'))
 async def restore_db(event):
@@ -281,78 +468,86 @@ async def restore_db(event):
     if not reply.document: return await event.reply("(!) No file found.")
     msg = await event.reply("⏳ Restoring...")
     try:
-        file_bytes = await reply.download_media(bytes)
-        with zipfile.ZipFile(io.BytesIO(file_bytes)) as z:
-            with z.open("hexabot_data.json") as f:
-                users = json.load(f)
-        for t in user_tasks.values(): t.cancel()
-        cursor = db.conn.cursor()
-        count = 0
-        for u in users:
-            cursor.execute("""INSERT OR REPLACE INTO users 
-                              (user_id, session, poke_list, ball, total_matched, total_caught, total_fled, total_shiny, start_time, notification_status, group_id, interval, schedule_time, schedule_active) 
-                              VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", 
-                           (u['user_id'], u['session'], u['poke_list'], u['ball'], 
-                            u['total_matched'], u['total_caught'], u['total_fled'], u.get('total_shiny', 0),
-                            u['start_time'], u['notification_status'], u['group_id'], u.get('interval', 2.5),
-                            u.get('schedule_time'), u.get('schedule_active', 0)))
-            count += 1
-            task = asyncio.create_task(run_userbot(u['user_id'], u['session'], notify_user))
-            user_tasks[u['user_id']] = task
-        db.conn.commit()
-        await msg.edit(f"✅ **Restored {count} users successfully.**")
+        with tempfile.TemporaryDirectory() as tmp:
+            path = await reply.download_media(file=tmp)
+            uids = await db.restore_users(path)
+        # Reload only the restored users, here or on their shards; the
+        # reconnects go through the admission controller
+        if supervisor: await db.load_users(set(uids))
+        count = sum(await run_all('reload', uids=uids))
+        sync_schedules()
+        await msg.edit(f"✅ **Restored {len(uids)} users successfully.**\n"
+                       f"🔌 Reconnecting {count} (see /startup).")
     except Exception as e:
         await msg.edit(f"❌ Restore Failed: {e}")
 
-# --- SCHEDULER TASK ---
-async def global_scheduler():
-    logger.info("Scheduler started.")
-    while True:
-        # Check every 60 seconds
-        now = datetime.now(IST)
-        current_time_str = now.strftime("%I:%M %p") # 10:00 AM
-        
-        # 1. Reset Daily Stats at 5 AM
-        if now.hour == 5 and now.minute == 0:
-            db.reset_daily_stats()
-            # Wait a minute so we don't trigger multiple times
-            await asyncio.sleep(60)
-            continue
-            
-        # 2. Check each user's schedule
-        for uid, config in user_configs.items():
-            if config.get('schedule_active') and config.get('schedule_time') == current_time_str:
-                # Only start if not already running
-                if not config.get('hunting'):
-                    config['hunting'] = True
-                    config['mode'] = 'SAFARI_INIT'
-                    if uid in user_clients:
-                        asyncio.create_task(auto_enter_loop(user_clients[uid], uid))
-                        try: await master.send_message(uid, f"⏰ **Schedule Triggered!**\nAuto-started at {current_time_str}")
-                        except: pass
-        
-        # Sleep until the start of the next minute
-        await asyncio.sleep(60 - datetime.now().second)
+# --- SCHEDULER JOBS ---
+scheduler = DailyScheduler()
+
+def schedule_user(uid):
+    """Puts a user's auto-start on the scheduler (or removes it)."""
+    config = user_configs.get(uid)
+    if not config or not config.schedule_active or not config.schedule_time:
+        scheduler.cancel(('wake', uid))
+        return scheduler.cancel(('user', uid))
+    dt = datetime.strptime(config.schedule_time, "%I:%M %p")
+
+    async def pre_wake(fire_dt):
+        # Reconnect a hibernated client ahead of time so the start is instant
+        await run_op(uid, 'wake')
+
+    async def auto_start(fire_dt):
+        # Only start if not already running; a client still connecting picks it up
+        if await run_op(uid, 'start', if_idle=True, wait=False) is not None:
+            try: await master.send_message(uid, f"⏰ **Schedule Triggered!**\nAuto-started at {fire_dt.strftime('%I:%M %p')}")
+            except: pass
+
+    scheduler.set_daily(('user', uid), dt.hour, dt.minute, auto_start)
+    if HIBERNATE_AFTER:
+        lead = dt - timedelta(seconds=WAKE_LEAD)
+        scheduler.set_daily(('wake', uid), lead.hour, lead.minute, pre_wake)
+
+def sync_schedules():
+    """Rebuilds every user job from user_configs (boot, restore)."""
+    for key in scheduler.keys():
+        if key[1] not in user_configs: scheduler.cancel(key)
+    for uid in user_configs: schedule_user(uid)
 
 # --- MAIN LOOP ---
 async def main():
+    global supervisor
+    await master.start(bot_token=BOT_TOKEN)
+    perf.start()
+    time_handlers(master, "cmd.")
+
     # Load Users
-    users = db.load_users()
-    print(f"Loaded {len(users)} users.")
-    
-    for u in users:
-        uid = u['user_id']
-        try:
-            task = asyncio.create_task(run_userbot(uid, u['session'], notify_user))
-            user_tasks[uid] = task
-        except Exception as e:
-            logger.error(f"Failed to start user {uid}: {e}")
+    await db.init_db()
+    if SHARDS > 1:
+        # Userbots run in worker processes; commands get routed to them
+        users = len(await db.load_users())
+        supervisor = Supervisor(SHARDS, notify_user)
+        await supervisor.start()
+    else:
+        # Connects are staggered through the admission controller
+        users = await local_op('reload', callback=notify_user)
+        asyncio.create_task(hibernation_sweeper())
+    print(f"Loaded {users} users.")
 
     # Start Scheduler
-    asyncio.create_task(global_scheduler())
+    sync_schedules()
+    asyncio.create_task(scheduler.run())
+    asyncio.create_task(db.stats_flusher())
+    notifier.start()
+    if METRICS_PORT:
+        # Optional endpoint: a busy port must not keep the bot from starting
+        try: await serve_prometheus(METRICS_PORT, metrics_snapshot)
+        except OSError as e: logger.error(f"[METRICS] Could not serve on port {METRICS_PORT}: {e}")
 
     print("Master Bot Started...")
-    await master.run_until_disconnected()
+    try:
+        await master.run_until_disconnected()
+    finally:
+        await db.close_db()
 
 if __name__ == '__main__':
     master.loop.run_until_complete(main())
@@ -0,0 +1,67 @@
+from collections import deque
+
+# --- TARGET MATCHER ---
+# Spawn names are checked against a user's target list on every wild
+# encounter. Instead of lowercasing the whole list each time, every distinct
+# list is compiled once into an Aho-Corasick automaton and shared by all
+# users that hunt with it.
+
+class TargetMatcher:
+    """Case-insensitive "does any target appear inside this name" check."""
+
+    def __init__(self, names):
+        self.names = tuple(names)
+        targets = {n.lower() for n in self.names if n}
+        self._exact = frozenset(targets)
+
+        # Trie: goto[state] maps char -> next state, out[state] marks a full target
+        goto, out = [{}], [False]
+        for word in targets:
+            state = 0
+            for ch in word:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    out.append(False)
+                state = nxt
+            out[state] = True
+
+        # Failure links (BFS), folding outputs so a single flag check suffices
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                out[nxt] = out[nxt] or out[fail[nxt]]
+                queue.append(nxt)
+
+        self._goto, self._fail, self._out = goto, fail, out
+
+    def matches(self, name):
+        name = name.lower()
+        if name in self._exact: return True
+
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for ch in name:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]: return True
+        return False
+
+_matchers = {}
+
+def get_matcher(names):
+    """Returns the shared matcher for this list, compiling it on first use."""
+    key = tuple(names)
+    matcher = _matchers.get(key)
+    if matcher is None:
+        matcher = _matchers[key] = TargetMatcher(key)
+    return matcher
@@ -0,0 +1,52 @@
+from collections import OrderedDict
+from telethon import errors
+
+SPRITE_CACHE_SIZE = 128
+
+# --- CATCH MEDIA ---
+# Catch images go userbot -> memory -> master bot, never via disk. Once the
+# master has sent an image, the returned media object is reused for every
+# other recipient, and kept in a small LRU keyed by the source file id since
+# HeXamonbot sends the same species art over and over.
+
+class MediaRef:
+    """Media on a userbot message; only downloaded if the master hasn't got it yet."""
+    __slots__ = ('client', 'message', 'key')
+
+    def __init__(self, client, message):
+        self.client = client
+        self.message = message
+        media = message.photo or message.document
+        self.key = getattr(media, 'id', None)
+
+    async def fetch(self):
+        return await self.client.download_media(self.message, bytes)
+
+_sprites = OrderedDict()  # source file id -> master-side media
+
+# Send failures that mean the cached media itself is bad, not the chat
+MEDIA_ERRORS = (errors.FileReferenceExpiredError, errors.FileReferenceInvalidError,
+                errors.FileReferenceEmptyError, errors.FileIdInvalidError,
+                errors.MediaEmptyError, errors.MediaInvalidError)
+
+async def prepare_media(master, ref):
+    """Returns something send_file accepts: a cached sprite or a fresh one-time upload."""
+    if ref.key in _sprites:
+        _sprites.move_to_end(ref.key)
+        return _sprites[ref.key]
+    data = await ref.fetch()
+    return await master.upload_file(data, file_name='sprite.jpg')
+
+def remember_media(ref, sent):
+    """Caches what Telegram now holds for this image and returns it for reuse."""
+    if not sent or not sent.media: return None
+    if ref.key is not None:
+        _sprites[ref.key] = sent.media
+        _sprites.move_to_end(ref.key)
+        while len(_sprites) > SPRITE_CACHE_SIZE:
+            _sprites.popitem(last=False)
+    return sent.media
+
+def forget_media(ref):
+    """Drops a cached sprite (e.g. its file reference expired)."""
+    _sprites.pop(ref.key, None)
@@ -0,0 +1,168 @@
+import asyncio
+import time
+from collections import deque
+from config import logger
+
+# --- HOT-PATH METRICS ---
+# Counters, 1-minute rates and latency histograms, each kept per user (label
+# "master" for the master bot). snapshot() is plain JSON so shards can ship
+# theirs to the supervisor, which merges them for /metrics and the
+# Prometheus endpoint.
+
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5, 10, float('inf'))
+RATE_WINDOW = 60
+
+DESCRIPTIONS = {
+    'hunt_sent': "/hunt commands sent",
+    'hunt_rejected': "/hunt commands rejected with a cooldown",
+    'click_retries': "robust_click retries",
+    'floodwait_seconds': "Seconds of FloodWait received",
+    'peer_resolves': "HeXamonbot username resolutions (peer cache misses)",
+    'reconnects': "Userbot reconnects after a dropped connection",
+    'reconnect_downtime_seconds': "Time a dropped userbot was offline",
+    'governor_wait_seconds': "Time throttled requests waited for the rate governor",
+    'loop_lag_seconds': "How late the event loop ran a 100 ms timer",
+    'hibernations': "Idle userbots disconnected to save resources",
+    'rehydrate_seconds': "Wake request to a hibernated userbot being live",
+    'spawn_to_engage_seconds': "Spawn event to Engage click",
+    'battle_to_throw_seconds': "Battle screen to Throw Ball click",
+    'notify_queue_delay_seconds': "Time alerts spent queued before delivery",
+}
+
+class Registry:
+    def __init__(self):
+        self._counters = {}  # name -> {user: value}
+        self._hists = {}     # name -> {user: [bucket counts..., sum, count]}
+        self._events = {}    # name -> {user: deque of timestamps}
+
+    def inc(self, name, user_id, value=1):
+        per_user = self._counters.setdefault(name, {})
+        key = str(user_id)
+        per_user[key] = per_user.get(key, 0) + value
+
+    def mark(self, name, user_id):
+        """Counts an event and remembers it for the 1-minute rate."""
+        self.inc(name, user_id)
+        now = time.monotonic()
+        q = self._events.setdefault(name, {}).setdefault(str(user_id), deque())
+        q.append(now)
+        while q and q[0] < now - RATE_WINDOW: q.popleft()
+
+    def observe(self, name, seconds, user_id):
+        per_user = self._hists.setdefault(name, {})
+        h = per_user.get(str(user_id))
+        if h is None:
+            h = per_user[str(user_id)] = [0] * len(BUCKETS) + [0.0, 0]
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                h[i] += 1
+                break
+        h[-2] += seconds
+        h[-1] += 1
+
+    def snapshot(self):
+        cutoff = time.monotonic() - RATE_WINDOW
+        rates = {name: {u: sum(1 for t in q if t >= cutoff) for u, q in per_user.items()}
+                 for name, per_user in self._events.items()}
+        return {'counters': self._counters, 'hists': self._hists, 'rates': rates}
+
+metrics = Registry()
+
+def merge_snapshots(snaps):
+    """Sums snapshots from several processes (users never overlap)."""
+    out = {'counters': {}, 'hists': {}, 'rates': {}}
+    for snap in snaps:
+        for kind in ('counters', 'rates'):
+            for name, per_user in snap[kind].items():
+                dst = out[kind].setdefault(name, {})
+                for u, v in per_user.items(): dst[u] = dst.get(u, 0) + v
+        for name, per_user in snap['hists'].items():
+            dst = out['hists'].setdefault(name, {})
+            for u, h in per_user.items():
+                dst[u] = [a + b for a, b in zip(dst[u], h)] if u in dst else list(h)
+    return out
+
+def _total_hist(per_user):
+    total = None
+    for h in per_user.values():
+        total = list(h) if total is None else [a + b for a, b in zip(total, h)]
+    return total
+
+def _quantile(h, q):
+    """Upper bucket bound holding the q-th observation."""
+    count = h[-1]
+    if not count: return 0
+    seen = 0
+    for i, bound in enumerate(BUCKETS):
+        seen += h[i]
+        if seen >= q * count: return bound
+    return BUCKETS[-1]
+
+def render_summary(snap, user_id=None):
+    """Short text for the /metrics command (global, or one user)."""
+    def pick(per_user):
+        if user_id is not None: return {str(user_id): per_user[str(user_id)]} if str(user_id) in per_user else {}
+        return per_user
+
+    lines = []
+    for name in ('hunt_sent', 'hunt_rejected', 'click_retries', 'floodwait_seconds', 'peer_resolves', 'reconnects',
+                 'hibernations'):
+        per_user = pick(snap['counters'].get(name, {}))
+        line = f"» {DESCRIPTIONS[name]}: {sum(per_user.values())}"
+        if name in snap['rates']:
+            line += f" ({sum(pick(snap['rates'][name]).values())}/min)"
+        lines.append(line)
+    for name in ('spawn_to_engage_seconds', 'battle_to_throw_seconds', 'notify_queue_delay_seconds',
+                 'reconnect_downtime_seconds', 'rehydrate_seconds', 'governor_wait_seconds', 'loop_lag_seconds'):
+        h = _total_hist(pick(snap['hists'].get(name, {})))
+        if not h:
+            lines.append(f"» {DESCRIPTIONS[name]}: no data")
+            continue
+        lines.append(f"» {DESCRIPTIONS[name]}: n={h[-1]} avg={h[-2] / h[-1]:.2f}s "
+                     f"p50≤{_quantile(h, 0.5)}s p95≤{_quantile(h, 0.95)}s")
+    return "\n".join(lines)
+
+def render_prometheus(snap):
+    out = []
+    for name, per_user in snap['counters'].items():
+        out.append(f"# HELP safari_{name}_total {DESCRIPTIONS.get(name, name)}")
+        out.append(f"# TYPE safari_{name}_total counter")
+        for u, v in per_user.items(): out.append(f'safari_{name}_total{{user="{u}"}} {v}')
+    for name, per_user in snap['rates'].items():
+        out.append(f"# HELP safari_{name}_per_minute {DESCRIPTIONS.get(name, name)} in the last minute")
+        out.append(f"# TYPE safari_{name}_per_minute gauge")
+        for u, v in per_user.items(): out.append(f'safari_{name}_per_minute{{user="{u}"}} {v}')
+    for name, per_user in snap['hists'].items():
+        out.append(f"# HELP safari_{name} {DESCRIPTIONS.get(name, name)}")
+        out.append(f"# TYPE safari_{name} histogram")
+        for u, h in per_user.items():
+            cumulative = 0
+            for i, bound in enumerate(BUCKETS):
+                cumulative += h[i]
+                le = "+Inf" if bound == float('inf') else bound
+                out.append(f'safari_{name}_bucket{{user="{u}",le="{le}"}} {cumulative}')
+            out.append(f'safari_{name}_sum{{user="{u}"}} {h[-2]}')
+            out.append(f'safari_{name}_count{{user="{u}"}} {h[-1]}')
+    return "\n".join(out) + "\n"
+
+async def serve_prometheus(port, get_snapshot):
+    """Serves GET /metrics on 127.0.0.1:port; `get_snapshot` is async."""
+    async def handle(reader, writer):
+        try:
+            request = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""): pass
+            if request.split()[1:2] == [b"/metrics"]:
+                body = render_prometheus(await get_snapshot()).encode()
+                head = "HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n"
+            else:
+                body = b"not found\n"
+                head = "HTTP/1.1 404 Not Found\r\nContent-Type: text/plain\r\n"
+            writer.write(f"{head}Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+            await writer.drain()
+        except Exception as e:
+            logger.error(f"[METRICS] HTTP error: {e}")
+        finally:
+            writer.close()
+
+    await asyncio.start_server(handle, '127.0.0.1', port)
+    logger.info(f"[METRICS] Prometheus endpoint on http://127.0.0.1:{port}/metrics")
@@ -0,0 +1,89 @@
+import asyncio
+import time
+from telethon import errors
+from config import logger
+from metrics import metrics
+from governor import governor
+
+# --- NOTIFICATION QUEUE ---
+# Userbot handlers only enqueue; worker tasks do the sending. Alerts for the
+# same user that arrive within `window` seconds are merged into one digest,
+# each chat gets at most one send per `chat_gap` seconds, and FloodWaits
+# pause only the chat that hit them.
+
+MAX_ITEMS_PER_DIGEST = 20
+CAPTION_LIMIT = 1024
+MESSAGE_LIMIT = 4096
+
+class Notifier:
+    def __init__(self, deliver, workers=4, maxsize=1000, window=3.0, chat_gap=1.0, retries=3):
+        self._deliver = deliver  # async (user_id, text, media) -> None
+        self._workers = workers
+        self._queue = asyncio.Queue(maxsize)
+        self._pending = {}     # user_id -> {'since': t, 'items': [(text, media)]}
+        self._chat_ready = {}  # chat_id -> monotonic time of next allowed send
+        self.window = window
+        self.chat_gap = chat_gap
+        self.retries = retries
+        self.dropped = 0
+
+    def start(self):
+        for _ in range(self._workers):
+            asyncio.create_task(self._worker())
+
+    def enqueue(self, user_id, message, media=None):
+        """Never waits: merges into the user's open digest or opens a new one."""
+        bucket = self._pending.get(user_id)
+        if bucket:
+            if len(bucket['items']) < MAX_ITEMS_PER_DIGEST:
+                bucket['items'].append((message, media))
+            return
+        self._pending[user_id] = {'since': time.monotonic(), 'items': [(message, media)]}
+        asyncio.get_running_loop().call_later(self.window, self._submit, user_id)
+
+    def _submit(self, user_id):
+        try:
+            self._queue.put_nowait(user_id)
+        except asyncio.QueueFull:
+            self._pending.pop(user_id, None)
+            self.dropped += 1
+            logger.warning(f"[NOTIFY] Queue full, dropped alerts for {user_id}")
+
+    def depth(self):
+        return self._queue.qsize()
+
+    async def _worker(self):
+        while True:
+            user_id = await self._queue.get()
+            bucket = self._pending.pop(user_id, None)
+            if not bucket: continue
+            items = bucket['items']
+            metrics.observe('notify_queue_delay_seconds', time.monotonic() - bucket['since'], user_id)
+
+            text = "\n".join(m for m, _ in items)
+            media = next((md for _, md in items if md), None)
+            limit = CAPTION_LIMIT if media else MESSAGE_LIMIT
+            if len(text) > limit: text = text[:limit - 1] + "…"
+
+            try:
+                await self._deliver(user_id, text, media)
+            except Exception as e:
+                logger.error(f"[NOTIFY] Delivery to {user_id} failed: {e}")
+
+    async def call(self, chat, func, *args, **kwargs):
+        """Runs one send to `chat` under its rate limit, retrying on FloodWait."""
+        for attempt in range(self.retries):
+            while True:
+                wait = self._chat_ready.get(chat, 0) - time.monotonic()
+                if wait <= 0: break
+                await asyncio.sleep(wait)
+            self._chat_ready[chat] = time.monotonic() + self.chat_gap
+            # Shares the process-wide budget with the userbots, behind their clicks
+            await governor.acquire('master', 'notify')
+            try:
+                return await func(*args, **kwargs)
+            except errors.FloodWaitError as e:
+                logger.warning(f"[NOTIFY] FloodWait {e.seconds}s on chat {chat}")
+                metrics.inc('floodwait_seconds', 'master', e.seconds)
+                self._chat_ready[chat] = time.monotonic() + e.seconds + 1
+                if attempt == self.retries - 1: raise
@@ -0,0 +1,76 @@
+from random import uniform
+from config import HUNT_JITTER
+
+# --- HUNT PACING ---
+# HeXamonbot enforces a server-side cooldown between /hunt commands and
+# replies "Please wait N seconds" to anything sent early. The pacer narrows
+# that cooldown down from every reply: an accepted /hunt means the gap since
+# the previous accepted one was long enough, a rejected one means the gap plus
+# N (rounded up by the bot) was needed. The hunt loop then sends at the
+# earliest moment that should be accepted instead of guessing.
+
+EWMA = 0.2  # weight of the newest reply latency sample
+
+class HuntPacer:
+    """One account's learned /hunt timing (all times are time.monotonic())."""
+
+    def __init__(self):
+        self.cooldown_lo = 0.0    # the cooldown is longer than this...
+        self.cooldown_hi = None   # ...and at most this (None until learned)
+        self.latency = None       # /hunt -> reply round trip, smoothed
+        self.last_sent = 0.0
+        self.last_ok = None       # send time of the last accepted /hunt
+        self.blocked_until = 0.0  # from the last "wait N seconds"
+        self.awaiting = False
+        self.sent = 0
+        self.rejected = 0
+        self._jitter = 0.0
+
+    def on_send(self, now):
+        self.last_sent = now
+        self.awaiting = True
+        self.sent += 1
+        self._jitter = uniform(*HUNT_JITTER)
+
+    def on_reply(self, now, wait=None):
+        """Records the bot's answer to our last /hunt; `wait` is the announced cooldown if rejected."""
+        rtt = now - self.last_sent
+        self.latency = rtt if self.latency is None else self.latency + EWMA * (rtt - self.latency)
+        self.awaiting = False
+
+        gap = self.last_sent - self.last_ok if self.last_ok is not None else None
+        if wait is None:
+            if gap is not None:
+                if gap < self.cooldown_lo: self.cooldown_lo = 0.0  # Cooldown got shorter
+                if self.cooldown_hi is None or gap < self.cooldown_hi: self.cooldown_hi = gap
+            self.last_ok = self.last_sent
+            return
+
+        self.rejected += 1
+        self.blocked_until = self.last_sent + wait
+        if gap is None: return
+        lo, hi = gap + wait - 1, gap + wait
+        if self.cooldown_hi is not None and lo >= self.cooldown_hi:
+            # Cooldown got longer; what we knew is stale
+            self.cooldown_lo, self.cooldown_hi = lo, hi
+        else:
+            self.cooldown_lo = max(self.cooldown_lo, lo)
+            self.cooldown_hi = hi if self.cooldown_hi is None else min(self.cooldown_hi, hi)
+
+    def reply_deadline(self):
+        """When to stop waiting for a reply and treat the /hunt as lost."""
+        return self.last_sent + (max(3 * self.latency, 2.0) if self.latency else 5.0)
+
+    def next_send(self, interval):
+        """Earliest time for the next /hunt: the user's timer, the learned cooldown and any announced wait."""
+        at = self.blocked_until
+        if self.last_ok is not None and self.cooldown_hi is not None:
+            at = max(at, self.last_ok + self.cooldown_hi)
+        # The jitter only pads the bot's limit; the user's timer is already their pace
+        return max(self.last_sent + interval, at + self._jitter)
+
+    def summary(self):
+        """Learned timings for /info."""
+        return {'cooldown': self.cooldown_hi, 'cooldown_lo': self.cooldown_lo,
+                'latency_ms': round(self.latency * 1000) if self.latency is not None else None,
+                'sent': self.sent, 'rejected': self.rejected}
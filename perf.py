@@ -0,0 +1,194 @@
+import asyncio
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from config import logger
+from metrics import metrics
+
+# --- PERFORMANCE MONITOR ---
+# Every userbot, the master bot and the scheduler share one event loop, so a
+# callback that blocks stalls every account. A ticker measures how late the
+# loop wakes it (lag). A watchdog thread notices when the ticker is overdue
+# and grabs the loop thread's stack, which names the code that is blocking.
+# Handler phases and master commands keep running totals of the time they
+# spent on the loop, so sleeps, network round-trips and waiting for a user's
+# reply don't count (see _OnLoop). On request
+# the same thread samples the loop's stack for a bounded window (/perf profile).
+
+LAG_INTERVAL = 0.1  # ticker period (seconds)
+STALL_THRESHOLD = 0.25  # lag that counts as a blocked loop
+PROFILE_INTERVAL = 0.005  # seconds between profiler samples
+PROFILE_MAX = 60  # longest profiling window
+TOP_N = 10
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+def _label(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{frame.f_lineno} {code.co_name}"
+
+def _where(frame):
+    """The innermost frame of our own code on the stack, plus what it was calling."""
+    inner = frame
+    while frame is not None and not frame.f_code.co_filename.startswith(ROOT): frame = frame.f_back
+    if frame is None or frame is inner: return _label(inner)
+    return f"{_label(frame)} -> {_label(inner)}"
+
+def _func(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+class _OnLoop:
+    """Awaits a coroutine step by step, adding up only the time each step
+    runs; time suspended at an await is left out."""
+    __slots__ = ('coro', 'busy')
+
+    def __init__(self, coro):
+        self.coro = coro
+        self.busy = 0.0
+
+    def __await__(self):
+        send, exc = None, None
+        while True:
+            start = time.perf_counter()
+            try:
+                future = self.coro.send(send) if exc is None else self.coro.throw(exc)
+            except StopIteration as e:
+                return e.value
+            finally:
+                self.busy += time.perf_counter() - start
+            try:
+                send, exc = (yield future), None
+            except GeneratorExit:
+                self.coro.close()
+                raise
+            except BaseException as e:
+                send, exc = None, e
+
+class PerfMonitor:
+    def __init__(self):
+        self.phases = {}  # name -> [count, total seconds, max seconds]
+        self.lag = deque(maxlen=int(60 / LAG_INTERVAL))  # the last minute of lag samples
+        self.max_lag = 0.0
+        self.stalls = deque(maxlen=20)  # (unix time, seconds, where)
+        self.sampled = 0
+        self._own = Counter()        # innermost function -> samples
+        self._inclusive = Counter()  # our function anywhere on the stack -> samples
+        self._profile_until = 0.0
+        self._beat = time.monotonic()
+        self._stack = None  # where the loop was during the current stall
+        self._thread_id = None
+
+    def start(self):
+        """Starts the ticker on the running loop and the watchdog thread."""
+        if self._thread_id is not None: return
+        self._thread_id = threading.get_ident()
+        asyncio.create_task(self._ticker())
+        threading.Thread(target=self._watch, name="perf-watchdog", daemon=True).start()
+
+    async def _ticker(self):
+        while True:
+            due = time.monotonic() + LAG_INTERVAL
+            await asyncio.sleep(LAG_INTERVAL)
+            now = time.monotonic()
+            self._beat = now
+            lag = max(0.0, now - due)
+            self.lag.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            metrics.observe('loop_lag_seconds', lag, 'loop')
+            where, self._stack = self._stack, None
+            if lag >= STALL_THRESHOLD:
+                where = where or "unknown (too short to catch)"
+                self.stalls.append((time.time(), lag, where))
+                logger.warning(f"[PERF] Event loop blocked for {lag * 1000:.0f} ms in {where}")
+
+    def _watch(self):
+        while True:
+            profiling = time.monotonic() < self._profile_until
+            time.sleep(PROFILE_INTERVAL if profiling else LAG_INTERVAL / 2)
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None: continue
+            if profiling: self._sample(frame)
+            if self._stack is None and time.monotonic() - self._beat > LAG_INTERVAL + STALL_THRESHOLD:
+                self._stack = _where(frame)
+
+    def _sample(self, frame):
+        self.sampled += 1
+        code = frame.f_code
+        if code.co_name == 'select' and code.co_filename.endswith('selectors.py'):
+            self._own['<idle>'] += 1
+            return
+        self._own[_func(frame)] += 1
+        seen = set()
+        while frame is not None:
+            if frame.f_code.co_filename.startswith(ROOT): seen.add(_func(frame))
+            frame = frame.f_back
+        self._inclusive.update(seen)
+
+    def profile(self, seconds):
+        """Samples the loop's stack for `seconds` (capped at PROFILE_MAX); returns the window used."""
+        seconds = max(1, min(seconds, PROFILE_MAX))
+        self._own.clear()
+        self._inclusive.clear()
+        self.sampled = 0
+        self._profile_until = time.monotonic() + seconds
+        return seconds
+
+    def _add(self, name, took):
+        p = self.phases.get(name)
+        if p is None: p = self.phases[name] = [0, 0.0, 0.0]
+        p[0] += 1
+        p[1] += took
+        if took > p[2]: p[2] = took
+
+    @contextmanager
+    def timed(self, name):
+        """Adds the time of a synchronous block to phase `name` (no awaits inside)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add(name, time.perf_counter() - start)
+
+    async def run(self, name, coro):
+        """Awaits `coro`, adding the time it spent on the loop to phase `name`."""
+        steps = _OnLoop(coro)
+        try:
+            return await steps
+        finally:
+            self._add(name, steps.busy)
+
+    def wrap(self, name, callback):
+        """`callback` (an async event handler) timed as phase `name`."""
+        @functools.wraps(callback)
+        async def timed_callback(event):
+            return await self.run(name, callback(event))
+        return timed_callback
+
+    def report(self, top=TOP_N):
+        """Lag, stalls, the slowest phases and the last profile, for /perf."""
+        lags = sorted(self.lag)
+        pick = lambda q: lags[min(len(lags) - 1, int(q * len(lags)))] if lags else 0.0
+        phases = sorted(([name, *p] for name, p in self.phases.items()), key=lambda p: p[2], reverse=True)
+        return {
+            'lag': {'p50': pick(0.5), 'p99': pick(0.99), 'max': self.max_lag},
+            'stalls': list(self.stalls)[-top:],
+            'phases': phases[:top],
+            'profile': {'samples': self.sampled, 'running': time.monotonic() < self._profile_until,
+                        'own': dict(self._own.most_common(5 * top)),
+                        'inclusive': dict(self._inclusive.most_common(5 * top))},
+        }
+
+def time_handlers(client, prefix):
+    """Re-registers every event handler on `client` wrapped in perf.wrap, in the same order."""
+    handlers = client.list_event_handlers()
+    wrapped = {}
+    for callback, _ in handlers: client.remove_event_handler(callback)
+    for callback, event in handlers:
+        if callback not in wrapped: wrapped[callback] = perf.wrap(f"{prefix}{callback.__name__}", callback)
+        client.add_event_handler(wrapped[callback], event)
+
+perf = PerfMonitor()
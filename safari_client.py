@@ -1,49 +1,108 @@
 import asyncio
-import re
-import os
-import functools
+import time
 from random import uniform
-from telethon import TelegramClient, events
+from telethon import TelegramClient, events, errors
 from telethon.sessions import StringSession
+from telethon.tl.types import InputPeerUser
 from config import *
+import database as db
 from database import update_stat
+from media import MediaRef
+from metrics import metrics
+from governor import governor
+from perf import perf
+from pacing import HuntPacer
+from state import Mode
+from classifier import classify, species_of, Welcome, AlreadyIn, Stopper, Wait, Caught, Fled, Battle, Spawn
 
-# Helper for non-blocking file and DB operations
-async def run_sync(func, *args):
-    loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(None, functools.partial(func, *args))
+# --- HUNT SIGNALS ---
+class HuntSignal:
+    """Per-user wakeup for the hunt loop. The handler and commands poke it on
+    cooldowns, mode changes and stop requests so the loop never polls."""
 
-async def robust_click(client, chat_id, msg_id, text_to_click):
-    """Retries clicking a button safely."""
+    def __init__(self):
+        self._event = asyncio.Event()
+        self.cooldown_until = 0.0
+        self.pacer = HuntPacer()
+
+    def notify(self):
+        self._event.set()
+
+    def set_cooldown(self, seconds):
+        self.cooldown_until = time.monotonic() + seconds
+        self.notify()
+
+    async def wait(self, timeout=None):
+        """Sleeps until notified or until `timeout` seconds pass."""
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._event.clear()
+
+def get_signal(user_id):
+    if user_id not in user_signals:
+        user_signals[user_id] = HuntSignal()
+    return user_signals[user_id]
+
+hunters = set()  # user ids with hunting on, so counting them doesn't scan
+idle_since = {}  # user_id -> monotonic time a connected client stopped hunting
+
+def set_mode(user_id, mode, hunting=None):
+    """Changes a user's mode and wakes their hunt loop."""
+    config = user_configs.get(user_id)
+    if not config: return
+    if hunting is not None:
+        config.hunting = hunting
+        if hunting:
+            hunters.add(user_id)
+            idle_since.pop(user_id, None)
+        else:
+            hunters.discard(user_id)
+            if user_id in user_clients: idle_since.setdefault(user_id, time.monotonic())
+    config.mode = mode
+    get_signal(user_id).notify()
+
+# --- CLICKING ---
+def find_button(markup, text_to_click):
+    """Returns the flat index of the first button containing the text, or -1."""
+    # Keyboards are a handful of buttons; a direct scan is as cheap as any cache key
+    target = text_to_click.lower()
+    i = 0
+    for row in markup.rows:
+        for b in row.buttons:
+            if target in b.text.lower(): return i
+            i += 1
+    return -1
+
+async def robust_click(client, chat_id, message, text_to_click, user_id):
+    """Clicks a button on the message we already have; refetches only if the click fails."""
+    msg = message
     attempt = 1
     while attempt <= 3:
         try:
-            msg = await client.get_messages(chat_id, ids=msg_id)
             if not msg or not msg.reply_markup: return False
             
-            # Find button index
-            target_index = -1
-            all_buttons = [b for row in msg.reply_markup.rows for b in row.buttons]
-            for i, btn in enumerate(all_buttons):
-                if text_to_click.lower() in btn.text.lower():
-                    target_index = i
-                    break
-            
+            target_index = find_button(msg.reply_markup, text_to_click)
             if target_index == -1: return False
             
-            await msg.click(target_index)
+            # Our own retries below; a FloodWait still pauses this account's clicks
+            await governor.call(user_id, 'click', msg.click, target_index, retries=0)
             return True
-        except Exception:
+        except Exception as e:
+            metrics.inc('click_retries', user_id)
             await asyncio.sleep(0.5)
             attempt += 1
+            # Markup may be stale, get a fresh copy for the retry
+            try: msg = await governor.call(user_id, 'read', client.get_messages, chat_id, ids=message.id)
+            except Exception: pass
     return False
 
 async def send_hunt_loop(client, chat_id, user_id):
-    """The main loop that sends /hunt."""
-    try:
-        entity = await client.get_entity(chat_id)
-        target_id = entity.id
-    except: return
+    """The main loop that sends /hunt, paced by what the bot's replies taught us."""
+    signal = get_signal(user_id)
+    pacer = signal.pacer
+    pacer.awaiting = False
 
     while True:
         # 1. Connection Safety Check
@@ -54,54 +113,44 @@ async def send_hunt_loop(client, chat_id, user_id):
         # 2. Config Checks
         if user_id not in user_configs: return
         config = user_configs[user_id]
-        if not config.get('hunting'): return 
+        if not config.hunting: return 
         
-        # Double check mode before acting
-        if config.get('mode') == 'ENGAGED': 
-            await asyncio.sleep(1)
+        # Engaged: sleep until the handler flips the mode or we get stopped
+        if config.mode is Mode.ENGAGED: 
+            await signal.wait()
             continue
 
         try:
-            # 3. Check Last Message for "Wait"
-            # Get 2 messages in case the very last one is our own /hunt that hasn't been replied to yet
-            msgs = await client.get_messages(chat_id, limit=2)
-            should_skip = False
-            
-            for msg in msgs:
-                if msg.sender_id == target_id:
-                    text_lower = msg.raw_text.lower()
-                    
-                    # Regex to find specific wait time
-                    wait_match = re.search(r"wait\s+(\d+)\s+second", text_lower)
-                    if wait_match:
-                        seconds = int(wait_match.group(1))
-                        # Add a random buffer to look human
-                        sleep_time = seconds + uniform(1.5, 3.0) 
-                        logger.info(f"[WAIT] {user_id} sleeping for {sleep_time:.2f}s")
-                        await asyncio.sleep(sleep_time)
-                        should_skip = True
-                        break
-                    elif "wait" in text_lower and "second" in text_lower:
-                        # Fallback if regex fails but keyword exists
-                        await asyncio.sleep(uniform(5, 10))
-                        should_skip = True
-                        break
-            
-            if should_skip: continue
+            # 3. Wait for the reply to the last /hunt (the handler wakes us)
+            now = time.monotonic()
+            if pacer.awaiting:
+                if now < pacer.reply_deadline():
+                    await signal.wait(pacer.reply_deadline() - now)
+                    continue
+                pacer.awaiting = False  # Reply lost; don't wait on it forever
 
-            # 4. Send Hunt
-            await client.send_message(chat_id, "/hunt")
-            
-            # 5. Wait for response (Variable Interval)
-            user_interval = config.get('interval', DEFAULT_INTERVAL)
-            
-            # Smart wait: check repeatedly if mode changed to ENGAGED (e.g., by a spawn)
-            slept = 0
-            while slept < user_interval:
-                if config.get('mode') == 'ENGAGED': break
-                await asyncio.sleep(0.1)
-                slept += 0.1
+            # 4. Earliest moment the bot should accept the next /hunt
+            user_interval = config.interval
+            wake = max(pacer.next_send(user_interval), signal.cooldown_until)
+            if wake > now:
+                if now < max(pacer.blocked_until, signal.cooldown_until):
+                    logger.info(f"[WAIT] {user_id} sleeping for {wake - now:.2f}s")
+                await signal.wait(wake - now)
+                continue
+
+            # 5. Send Hunt
+            await governor.call(user_id, 'hunt', client.send_message, chat_id, "/hunt", retries=0)
+            pacer.on_send(time.monotonic())
+            metrics.mark('hunt_sent', user_id)
                 
+        except errors.FloodWaitError as e:
+            # The governor already paused this account's /hunt; the next send waits it out
+            logger.warning(f"[HUNT] {user_id} FloodWait {e.seconds}s")
+        except errors.PeerIdInvalidError:
+            # Cached access hash no longer valid; resolve again
+            logger.warning(f"[PEER] {user_id} cached peer rejected, resolving again")
+            await db.forget_peer(user_id, HEXA_ID)
+            chat_id = await resolve_bot_peer(client, user_id)
         except Exception as e:
             logger.error(f"[HUNT ERROR] {user_id}: {e}")
             await asyncio.sleep(5)
@@ -110,118 +159,367 @@ async def auto_enter_loop(client, uid):
     """Tries to enter the safari zone."""
     for i in range(5):
         config = user_configs.get(uid)
-        if not config or not config.get('hunting') or config.get('mode') != 'SAFARI_INIT': 
+        if not config or not config.hunting or config.mode is not Mode.SAFARI_INIT: 
             return
         
-        try: await client.send_message(HEXA_ID, "/enter")
+        try: await governor.call(uid, 'enter', client.send_message, user_peers.get(uid, HEXA_ID), "/enter", retries=0)
         except: pass
         await asyncio.sleep(5)
 
-async def run_userbot(user_id, session_str, master_bot_callback):
-    """Main process for a single user."""
+# --- LOOP SUPERVISION ---
+MAX_LOOP_RESTARTS = 5
+
+class LoopSupervisor:
+    """Owns at most one task per (user, role), e.g. 'hunt' and 'enter'.
+
+    Starting a role again cancels the old task first. A loop that crashes is
+    restarted with exponential backoff; one that returns normally is done.
+    """
+
+    def __init__(self):
+        self._tasks = {}     # (user_id, role) -> task
+        self._restarts = {}  # (user_id, role) -> restart count
+
+    def start(self, user_id, role, factory):
+        """Runs `await factory()` as the user's only `role` loop."""
+        key = (user_id, role)
+        old = self._tasks.get(key)
+        if old and not old.done(): old.cancel()
+        self._restarts[key] = 0
+        self._tasks[key] = asyncio.create_task(self._guard(key, factory))
+
+    async def _guard(self, key, factory):
+        while True:
+            try:
+                return await factory()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._restarts[key] += 1
+                if self._restarts[key] > MAX_LOOP_RESTARTS:
+                    logger.error(f"[LOOP] {key[1]} loop for {key[0]} gave up: {e}")
+                    return
+                delay = min(2 ** self._restarts[key], 60)
+                logger.warning(f"[LOOP] {key[1]} loop for {key[0]} crashed ({e}), restarting in {delay}s")
+                await asyncio.sleep(delay)
+
+    def stop(self, user_id, role=None):
+        for key, task in list(self._tasks.items()):
+            if key[0] == user_id and (role is None or key[1] == role):
+                task.cancel()
+                del self._tasks[key]
+
+    def stop_all(self):
+        for task in self._tasks.values(): task.cancel()
+        self._tasks.clear()
+
+    def state(self, user_id):
+        """{role: 'running' | 'idle'} plus crash counts, for /info."""
+        out = {}
+        for (uid, role), task in self._tasks.items():
+            if uid != user_id: continue
+            out[role] = 'running' if not task.done() else 'idle'
+            if self._restarts.get((uid, role)): out[role] += f" ({self._restarts[(uid, role)]} crashes)"
+        return out
+
+loops = LoopSupervisor()
+
+# --- SESSION CONTROL ---
+def start_safari(user_id, if_idle=False):
+    """Puts a user into SAFARI_INIT and starts /enter retries.
+
+    Returns None if skipped (unknown user, or already hunting with
+    `if_idle`), otherwise whether their client was connected.
+    """
+    config = user_configs.get(user_id)
+    if not config or (if_idle and config.hunting): return None
+    set_mode(user_id, Mode.SAFARI_INIT, hunting=True)
+    if user_id not in user_clients: return False
+    client = user_clients[user_id]
+    loops.start(user_id, 'enter', lambda: auto_enter_loop(client, user_id))
+    return True
+
+def stop_safari(user_id):
+    """Stops a user's session. Returns whether it was running."""
+    config = user_configs.get(user_id)
+    if not config: return False
+    was_hunting = config.hunting
+    set_mode(user_id, Mode.STOPPED, hunting=False)
+    return was_hunting
+
+def start_userbot(user_id, session_str, master_bot_callback, ready=None):
+    old = user_tasks.get(user_id)
+    if old and not old.done(): old.cancel()
+    task = asyncio.create_task(run_userbot(user_id, session_str, master_bot_callback, ready))
+    user_tasks[user_id] = task
+    return task
+
+async def resolve_bot_peer(client, user_id):
+    """HeXamonbot's input peer for this account: from the DB cache, or one
+    username resolution that is then cached. StringSessions keep no entity
+    cache, so without this every restart resolves again."""
+    cached = await db.get_peer(user_id, HEXA_ID)
+    if cached:
+        peer = InputPeerUser(*cached)
+    else:
+        entity = await governor.call(user_id, 'read', client.get_input_entity, HEXA_ID)
+        metrics.inc('peer_resolves', user_id)
+        peer = InputPeerUser(entity.user_id, entity.access_hash)
+        await db.save_peer(user_id, HEXA_ID, peer.user_id, peer.access_hash)
+    user_peers[user_id] = peer
+    return peer
+
+# --- RECONNECTS ---
+RECONNECT_BASE = 2.0
+RECONNECT_MAX = 300.0
+conn_stats = {}  # user_id -> {'reconnects', 'downtime', 'down_since'}
+
+async def reconnect(client, user_id):
+    """Reconnects a dropped client with jittered exponential backoff.
+
+    Returns False if the session turned out to be revoked.
+    """
+    stats = conn_stats.setdefault(user_id, {'reconnects': 0, 'downtime': 0.0, 'down_since': None})
+    stats['down_since'] = time.time()
+    down = time.monotonic()
+    get_signal(user_id).notify()  # Let a sleeping hunt loop see the drop
+    attempt = 0
+    while True:
+        delay = min(RECONNECT_MAX, RECONNECT_BASE * 2 ** attempt) * uniform(0.5, 1.5)
+        attempt += 1
+        logger.warning(f"[CONN] {user_id} disconnected, reconnect attempt {attempt} in {delay:.1f}s")
+        await asyncio.sleep(delay)
+        try:
+            await client.connect()
+            if not await client.is_user_authorized():
+                logger.error(f"User {user_id} session expired.")
+                return False
+            break
+        except Exception as e:
+            logger.warning(f"[CONN] {user_id} reconnect failed: {e}")
+
+    downtime = time.monotonic() - down
+    stats['reconnects'] += 1
+    stats['downtime'] += downtime
+    stats['down_since'] = None
+    metrics.inc('reconnects', user_id)
+    metrics.observe('reconnect_downtime_seconds', downtime, user_id)
+    logger.info(f"[CONN] {user_id} reconnected after {downtime:.1f}s")
+    return True
+
+class _Missed:
+    """Minimal event wrapper so fetched messages can go through the handler."""
+    __slots__ = ('message', 'raw_text')
+
+    def __init__(self, message):
+        self.message = message
+        self.raw_text = message.raw_text
+
+async def catch_up(client, user_id, handler, last_seen, engaged_id=0):
+    """Feeds what HeXamonbot sent while we were offline through the handler,
+    then restarts whichever loop the user's mode needs. `engaged_id` is the
+    battle message of an encounter in progress."""
+    peer = user_peers.get(user_id, HEXA_ID)
+    config = user_configs.get(user_id)
+    try:
+        missed = []
+        if last_seen:
+            missed = list(reversed(await governor.call(user_id, 'read', client.get_messages, peer, min_id=last_seen, limit=20)))
+        if config and config.mode is Mode.ENGAGED and engaged_id:
+            # The battle screen is edited in place; its edits don't show up as new messages
+            current = await governor.call(user_id, 'read', client.get_messages, peer, ids=engaged_id)
+            if current: missed.insert(0, current)
+        for message in missed:
+            # The history has our own /hunt and /enter too; only the bot's side is handled
+            if message.out: continue
+            await handler(_Missed(message))
+    except Exception as e:
+        logger.error(f"[CONN] {user_id} catch-up failed: {e}")
+    resume_loops(client, user_id)
+
+def resume_loops(client, user_id):
+    """Starts whichever loop the user's mode needs on a (re)connected client."""
+    config = user_configs.get(user_id)
+    if not config or not config.hunting: return
+    if config.mode is Mode.SAFARI_INIT:
+        loops.start(user_id, 'enter', lambda: auto_enter_loop(client, user_id))
+    else:
+        loops.start(user_id, 'hunt', lambda: send_hunt_loop(client, user_peers[user_id], user_id))
+
+def make_client(session_str):
+    """Builds a userbot client (the load-test harness swaps this out)."""
+    return TelegramClient(StringSession(session_str), API_ID, API_HASH)
+
+async def run_userbot(user_id, session_str, master_bot_callback, ready=None):
+    """Main process for a single user.
+
+    If given, `ready` (a future) resolves to True once handlers are live,
+    False if the session is expired, or the connect error.
+    """
+    client = None
     try:
-        client = TelegramClient(StringSession(session_str), API_ID, API_HASH)
+        client = make_client(session_str)
         await client.connect()
         
         if not await client.is_user_authorized():
             logger.error(f"User {user_id} session expired.")
+            if ready and not ready.done(): ready.set_result(False)
             return
 
+        # Before the handlers, so their chat filter needs no lookup either
+        peer = await resolve_bot_peer(client, user_id)
         user_clients[user_id] = client
     except Exception as e:
         logger.error(f"Connect fail {user_id}: {e}")
+        if ready and not ready.done(): ready.set_exception(e)
         return
+    finally:
+        # Expired, failed or cancelled (connect timeout, hibernate) before the
+        # handover: a connected client left here would leak its connection
+        if client and user_clients.get(user_id) is not client and client.is_connected():
+            await client.disconnect()
+
+    # The wild Pokémon we engaged (species, level, shiny), for the catch log
+    encounter = None
+    last_seen = 0  # newest HeXamonbot message id handled, for catch-up after a drop
+    engaged_id = 0  # message of the encounter we engaged, refetched after a drop
 
     # --- EVENT HANDLERS ---
-    @client.on(events.NewMessage(chats=HEXA_ID))
-    @client.on(events.MessageEdited(chats=HEXA_ID))
+    @client.on(events.NewMessage(chats=peer))
+    @client.on(events.MessageEdited(chats=peer))
     async def handler(event):
+        nonlocal last_seen
         config = user_configs.get(user_id)
         if not config: return
+        last_seen = max(last_seen, event.message.id)
         
+        received = time.monotonic()
         text = event.raw_text
-        text_lower = text.lower()
-        msg_id = event.message.id
+        with perf.timed('hexa.classify'):
+            kind = classify(text, event.message.reply_markup)
+
+        # Anything but a battle edit answers our last /hunt
+        signal = get_signal(user_id)
+        answered = signal.pacer.awaiting and not isinstance(kind, Battle)
+        if answered:
+            signal.pacer.on_reply(received, kind.seconds if isinstance(kind, Wait) else None)
+            signal.notify()
+        if kind is None: return
+        await perf.run(f"hexa.{type(kind).__name__}", on_kind(event, kind, config, signal, answered, received))
+
+    async def on_kind(event, kind, config, signal, answered, received):
+        """Acts on one classified HeXamonbot message."""
+        nonlocal encounter, engaged_id
 
         # --- AUTO START ---
-        if "welcome to the" in text_lower and "safari zone" in text_lower:
-            config['hunting'] = True
-            config['mode'] = 'SEARCHING'
+        if isinstance(kind, Welcome):
+            set_mode(user_id, Mode.SEARCHING, hunting=True)
             await master_bot_callback(user_id, "[+] **Safari Session Started!**")
-            # Cancel old task if exists
-            if user_id in user_tasks and not user_tasks[user_id].done():
-                 # Logic to handle clean restart if needed, mostly fine to just start new loop
-                 pass
-            asyncio.create_task(send_hunt_loop(client, HEXA_ID, user_id))
+            # Replaces (cancels) any hunt loop already running for this user
+            loops.start(user_id, 'hunt', lambda: send_hunt_loop(client, user_peers[user_id], user_id))
             return
         
-        if "already in the" in text_lower and "safari zone" in text_lower:
-             if config.get('mode') == 'SAFARI_INIT':
-                config['hunting'] = True
-                config['mode'] = 'SEARCHING'
-                asyncio.create_task(send_hunt_loop(client, HEXA_ID, user_id))
+        if isinstance(kind, AlreadyIn):
+             if config.mode is Mode.SAFARI_INIT:
+                set_mode(user_id, Mode.SEARCHING, hunting=True)
+                loops.start(user_id, 'hunt', lambda: send_hunt_loop(client, user_peers[user_id], user_id))
              return
 
-        if not config.get('hunting'): return
+        if not config.hunting: return
 
         # --- STOPPERS ---
-        if any(x in text_lower for x in ["already played", "limit reached", "out of safari balls", "game has finished"]):
-            config['hunting'] = False
-            config['mode'] = 'STOPPED'
-            await master_bot_callback(user_id, f"[!] **Session Ended:**\n{text.splitlines()[0]}")
+        if isinstance(kind, Stopper):
+            set_mode(user_id, Mode.STOPPED, hunting=False)
+            await master_bot_callback(user_id, f"[!] **Session Ended:**\n{kind.line}")
+            return
+
+        # --- COOLDOWN ---
+        if isinstance(kind, Wait):
+            metrics.inc('hunt_rejected', user_id)
+            # Parsed waits are learned by the pacer above
+            if kind.seconds is None:
+                # Bot said wait but no number we could parse
+                signal.set_cooldown(uniform(5, 10))
+            elif not answered:
+                # Late reply the pacer had already given up on
+                signal.set_cooldown(kind.seconds)
             return
 
         # --- CATCH LOGIC ---
-        if "caught a wild" in text_lower:
-            # Non-blocking DB call
-            await run_sync(update_stat, user_id, 'total_caught')
+        if isinstance(kind, Caught):
+            # In-memory; flushed to the DB in batches
+            update_stat(user_id, 'total_caught', *(encounter or ()))
+            encounter = None
             
-            msg = text.splitlines()[0]
+            msg = kind.line
             if event.message.media:
-                path = await client.download_media(event.message)
-                await master_bot_callback(user_id, f"**{msg}**", path)
-                await run_sync(os.remove, path)
+                # Fetched in memory by the master side, only if not cached
+                await master_bot_callback(user_id, f"**{msg}**", MediaRef(client, event.message))
             else:
                 await master_bot_callback(user_id, f"**{msg}**")
             
-            config['mode'] = 'SEARCHING'
+            set_mode(user_id, Mode.SEARCHING)
+            return
+
+        if isinstance(kind, Fled):
+            update_stat(user_id, 'total_fled', *(encounter or ()))
+            encounter = None
+            set_mode(user_id, Mode.SEARCHING)
             return
 
         # --- BATTLE/CATCH SCREEN ---
-        is_battle = text.strip().startswith("Wild") or (event.message.reply_markup and "throw ball" in event.message.reply_markup.rows[0].buttons[0].text.lower())
-        
-        if is_battle:
-            config['mode'] = 'ENGAGED'
+        if isinstance(kind, Battle):
+            set_mode(user_id, Mode.ENGAGED)
+            engaged_id = event.message.id
             # Random delay before throwing to mimic human reaction
-            await asyncio.sleep(uniform(2.0, 4.0))
-            await robust_click(client, HEXA_ID, msg_id, "Throw Ball")
+            await asyncio.sleep(uniform(*THROW_DELAY))
+            if await robust_click(client, user_peers[user_id], event.message, "Throw Ball", user_id):
+                metrics.observe('battle_to_throw_seconds', time.monotonic() - received, user_id)
             return
 
         # --- SPAWN DETECTION ---
-        match = re.search(r"wild\s+(.+?)\s+\(Lv", text, re.IGNORECASE)
-        if match:
-            name = match.group(1).strip()
-            is_shiny = "✨" in text or "✨" in name
+        if isinstance(kind, Spawn):
+            name = kind.name
             
             should_catch = False
-            if is_shiny:
+            if kind.shiny:
                 should_catch = True
-                await run_sync(update_stat, user_id, 'total_shiny')
+                update_stat(user_id, 'total_shiny', species_of(name), kind.level, True)
                 await master_bot_callback(user_id, f"★ **SHINY DETECTED: {name}**")
-            elif any(t.lower() in name.lower() for t in config['list']):
+            elif config.matcher.matches(name):
                 should_catch = True
             
             if should_catch:
-                await run_sync(update_stat, user_id, 'total_matched')
-                config['mode'] = 'ENGAGED'
-                await asyncio.sleep(uniform(0.5, 1.5))
-                await robust_click(client, HEXA_ID, msg_id, "Engage")
+                encounter = (species_of(name), kind.level, kind.shiny)
+                update_stat(user_id, 'total_matched', *encounter)
+                set_mode(user_id, Mode.ENGAGED)
+                engaged_id = event.message.id
+                await asyncio.sleep(uniform(*ENGAGE_DELAY))
+                if await robust_click(client, user_peers[user_id], event.message, "Engage", user_id):
+                    metrics.observe('spawn_to_engage_seconds', time.monotonic() - received, user_id)
             return
 
+    if ready and not ready.done(): ready.set_result(True)
+    # A start that came in while the client was down (or hibernated) runs now
+    resume_loops(client, user_id)
+    config = user_configs.get(user_id)
+    if config and not config.hunting: idle_since.setdefault(user_id, time.monotonic())
+
+    # Runs until cancelled; a dropped connection is re-established on the
+    # same client, so the session and its update state are kept
     try:
-        await client.run_until_disconnected()
-    except:
-        pass
+        while True:
+            try:
+                await client.run_until_disconnected()
+            except Exception as e:
+                logger.warning(f"[CONN] {user_id} connection error: {e}")
+            if not await reconnect(client, user_id): break
+            await catch_up(client, user_id, handler, last_seen, engaged_id)
     finally:
+        loops.stop(user_id)
+        if user_clients.get(user_id) is client: del user_clients[user_id]
+        idle_since.pop(user_id, None)
         if client.is_connected(): await client.disconnect()
+        # Let a sleeping hunt loop notice the disconnect
+        get_signal(user_id).notify()
 
@@ -0,0 +1,74 @@
+import asyncio
+import heapq
+import time
+from datetime import datetime, timedelta
+from config import logger, IST
+
+# --- DAILY JOB SCHEDULER ---
+# Jobs sit in a min-heap keyed by their next fire time (IST). The loop sleeps
+# until the earliest one is due and wakes early when the heap changes. Jobs
+# that came due while the loop was stalled fire as soon as it runs again.
+# Replaced or cancelled jobs are dropped lazily via a per-key version.
+
+MAX_SLEEP = 3600  # re-check at least hourly in case the wall clock jumps
+
+def next_fire(hour, minute, after):
+    """Next IST datetime at hour:minute strictly after `after`."""
+    fire = after.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if fire <= after: fire += timedelta(days=1)
+    return fire
+
+class DailyScheduler:
+    def __init__(self):
+        self._heap = []     # (timestamp, version, key)
+        self._jobs = {}     # key -> (version, hour, minute, callback)
+        self._version = 0
+        self._wake = asyncio.Event()
+
+    def set_daily(self, key, hour, minute, callback):
+        """(Re)schedules `await callback(fire_dt)` every day at hour:minute IST."""
+        self._version += 1
+        self._jobs[key] = (self._version, hour, minute, callback)
+        self._push(key, next_fire(hour, minute, datetime.now(IST)))
+
+    def cancel(self, key):
+        if self._jobs.pop(key, None): self._wake.set()
+
+    def keys(self):
+        return list(self._jobs)
+
+    def _push(self, key, fire_dt):
+        version = self._jobs[key][0]
+        heapq.heappush(self._heap, (fire_dt.timestamp(), version, key))
+        self._wake.set()
+
+    def next_due(self):
+        """Timestamp of the earliest live job, or None."""
+        while self._heap:
+            ts, version, key = self._heap[0]
+            job = self._jobs.get(key)
+            if job and job[0] == version: return ts
+            heapq.heappop(self._heap)
+        return None
+
+    async def run(self):
+        logger.info("Scheduler started.")
+        while True:
+            due = self.next_due()
+            self._wake.clear()
+            timeout = None if due is None else min(max(due - time.time(), 0), MAX_SLEEP)
+            if timeout != 0:
+                try: await asyncio.wait_for(self._wake.wait(), timeout)
+                except asyncio.TimeoutError: pass
+
+            now = time.time()
+            while (due := self.next_due()) is not None and due <= now:
+                _, version, key = heapq.heappop(self._heap)
+                _, hour, minute, callback = self._jobs[key]
+                fire_dt = datetime.fromtimestamp(due, IST)
+                if now - due > 60:
+                    logger.warning(f"[SCHED] Catching up {key} due at {fire_dt:%H:%M} ({now - due:.0f}s late)")
+                # Next run is the next slot after now, so a long stall fires once
+                self._push(key, next_fire(hour, minute, datetime.now(IST)))
+                try: await callback(fire_dt)
+                except Exception as e: logger.error(f"[SCHED] Job {key} failed: {e}")
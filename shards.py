@@ -0,0 +1,298 @@
+import asyncio
+import base64
+import bisect
+import hashlib
+import json
+import os
+import sys
+from collections import OrderedDict
+from config import logger, user_configs, user_tasks, LOG_FILE
+import database as db
+from safari_client import start_safari, stop_safari, start_userbot, set_mode, get_signal, loops, hunters, conn_stats
+from admission import admission, PRIORITY_HIGH, PRIORITY_NORMAL
+from hibernation import hibernating, wake, hibernation_sweeper
+from metrics import metrics
+from governor import governor
+from perf import perf, TOP_N
+from state import UserState, Mode
+
+# --- SHARDED RUNNER ---
+# With SHARDS > 1 the master process only runs the master bot, the scheduler
+# and the DB-facing commands. Userbots live in worker processes (this file run
+# as a script), each owning the users that hash to it on a consistent-hash
+# ring. Master and workers talk JSON lines over a localhost socket; per-user
+# commands go to the owning shard, global ones are broadcast and summed.
+
+IPC_LIMIT = 16 * 1024 * 1024  # catch images travel base64-encoded
+RESPAWN_DELAY = 5
+
+class HashRing:
+    """Consistent hashing of user ids onto shard numbers."""
+
+    def __init__(self, shards, replicas=64):
+        points = sorted((_hash(f"shard-{s}-{r}"), s) for s in range(shards) for r in range(replicas))
+        self._keys = [p for p, _ in points]
+        self._shards = [s for _, s in points]
+
+    def owner(self, user_id):
+        i = bisect.bisect(self._keys, _hash(str(user_id))) % len(self._keys)
+        return self._shards[i]
+
+def _hash(value):
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], 'big')
+
+class Channel:
+    """JSON-lines request/response over a local stream; either end can call."""
+
+    def __init__(self, reader, writer, handler):
+        self._reader = reader
+        self._writer = writer
+        self._handler = handler  # async (channel, msg) -> result
+        self._pending = {}
+        self._next_id = 0
+
+    def send(self, op, **args):
+        """Fire-and-forget message."""
+        self._write({'op': op, 'args': args})
+
+    async def request(self, op, **args):
+        self._next_id += 1
+        fut = asyncio.get_running_loop().create_future()
+        self._pending[self._next_id] = fut
+        self._write({'id': self._next_id, 'op': op, 'args': args})
+        return await fut
+
+    def _write(self, msg):
+        self._writer.write(json.dumps(msg).encode() + b"\n")
+
+    async def serve(self):
+        """Reads until the other side goes away."""
+        try:
+            while True:
+                line = await self._reader.readline()
+                if not line: break
+                msg = json.loads(line)
+                if 'op' in msg:
+                    asyncio.create_task(self._dispatch(msg))
+                    continue
+                fut = self._pending.pop(msg['id'], None)
+                if not fut or fut.done(): continue
+                if 'error' in msg: fut.set_exception(RuntimeError(msg['error']))
+                else: fut.set_result(msg.get('result'))
+        finally:
+            for fut in self._pending.values():
+                if not fut.done(): fut.set_exception(ConnectionError("shard channel closed"))
+            self._pending.clear()
+            self._writer.close()
+
+    async def _dispatch(self, msg):
+        try:
+            reply = {'result': await self._handler(self, msg)}
+        except Exception as e:
+            reply = {'error': f"{type(e).__name__}: {e}"}
+        if 'id' in msg:
+            reply['id'] = msg['id']
+            self._write(reply)
+
+# --- LOCAL OPERATIONS ---
+# Run in-process in single-process mode and inside each worker when sharded.
+_owns = None  # user_id -> bool; None means this process owns everyone
+
+async def local_op(op, uid=None, callback=None, **args):
+    if op == 'start':
+        config = user_configs.get(uid)
+        if config and not (args.get('if_idle') and config.hunting):
+            # Wait for a hibernated client so the reply reflects the real state;
+            # with `wait=False` the enter loop starts once the client is back
+            if args.get('wait', True): await wake(uid, callback)
+            elif uid in hibernating: asyncio.create_task(wake(uid, callback))
+        return start_safari(uid, args.get('if_idle', False))
+    if op == 'wake':
+        # Runs in the background: the caller (the scheduler) must not wait on a connect
+        if uid not in hibernating: return False
+        asyncio.create_task(wake(uid, callback))
+        return True
+    if op == 'stop':
+        return stop_safari(uid)
+    if op == 'interval':
+        if uid in user_configs: user_configs[uid].interval = args['value']
+        return uid in user_configs
+    if op == 'login':
+        hibernating.discard(uid)
+        user_configs[uid] = UserState()
+        start_userbot(uid, args['session'], callback)
+        return True
+    if op == 'info':
+        c = user_configs.get(uid)
+        if not c: return None
+        return {'hunting': c.hunting, 'stats': c.stats(), 'loops': loops.state(uid),
+                'pacing': get_signal(uid).pacer.summary(), 'conn': conn_stats.get(uid),
+                'hibernating': uid in hibernating}
+    if op == 'summary':
+        return {'users': len(user_configs), 'active': len(hunters), 'hibernating': len(hibernating)}
+    if op == 'allstart':
+        count = 0
+        for uid in list(user_configs):
+            if start_safari(uid, if_idle=True) is None: continue
+            count += 1
+            # Hunting is already on; the enter loop starts once the client is back
+            if uid in hibernating: asyncio.create_task(wake(uid, callback))
+        return count
+    if op == 'allstop':
+        return sum(1 for uid in list(user_configs) if stop_safari(uid))
+    if op == 'metrics':
+        return metrics.snapshot()
+    if op == 'startup':
+        return admission.status()
+    if op == 'queues':
+        return governor.status()
+    if op == 'perf':
+        return perf.report(args.get('top', TOP_N))
+    if op == 'perf_profile':
+        return perf.profile(args['seconds'])
+    if op == 'reload':
+        # Fresh start from the DB (boot, or after /fullimport); `uids` limits it to those users
+        uids = set(args['uids']) if args.get('uids') is not None else None
+        targets = list(user_configs) if uids is None else [uid for uid in uids if uid in user_configs]
+        was_hunting = {uid for uid in targets if user_configs[uid].hunting}
+        for uid in targets:
+            task = user_tasks.pop(uid, None)
+            if task: task.cancel()
+            hibernating.discard(uid)
+            loops.stop(uid)
+            set_mode(uid, Mode.STOPPED, hunting=False)
+            del user_configs[uid]
+        count = 0
+        for u in await db.load_users(uids):
+            uid = u['user_id']
+            if _owns and not _owns(uid):
+                user_configs.pop(uid, None)
+                continue
+            count += 1
+            # Connects are staggered; scheduled and mid-hunt users go first
+            urgent = uid in was_hunting or user_configs[uid].schedule_active
+            admission.admit(uid, u['session'], callback, PRIORITY_HIGH if urgent else PRIORITY_NORMAL)
+        return count
+    raise ValueError(f"unknown op {op}")
+
+# --- SUPERVISOR (master process) ---
+class RemoteMedia:
+    """MediaRef stand-in for media held by a worker; fetched over IPC on demand."""
+    __slots__ = ('channel', 'token', 'key')
+
+    def __init__(self, channel, token, key):
+        self.channel = channel
+        self.token = token
+        self.key = key
+
+    async def fetch(self):
+        return base64.b64decode(await self.channel.request('fetch_media', token=self.token))
+
+class Supervisor:
+    def __init__(self, shards, notify):
+        self.shards = shards
+        self.ring = HashRing(shards)
+        self._notify = notify
+        self._channels = {}
+        self._ready = {i: asyncio.Event() for i in range(shards)}
+        self._port = None
+
+    async def start(self):
+        server = await asyncio.start_server(self._on_connect, '127.0.0.1', 0, limit=IPC_LIMIT)
+        self._port = server.sockets[0].getsockname()[1]
+        for i in range(self.shards):
+            asyncio.create_task(self._keep_alive(i))
+        logger.info(f"[SHARDS] Supervisor on port {self._port} with {self.shards} workers")
+
+    async def _keep_alive(self, shard):
+        """Runs one worker process and respawns it if it dies."""
+        script = os.path.abspath(__file__)
+        while True:
+            base, ext = os.path.splitext(LOG_FILE)
+            proc = await asyncio.create_subprocess_exec(
+                sys.executable, script, str(shard), str(self.shards), str(self._port),
+                cwd=os.getcwd(), env={**os.environ, 'SAFARI_LOG_FILE': f"{base}.shard{shard}{ext}"})
+            code = await proc.wait()
+            self._ready[shard].clear()
+            self._channels.pop(shard, None)
+            logger.warning(f"[SHARDS] Worker {shard} exited ({code}), restarting in {RESPAWN_DELAY}s")
+            await asyncio.sleep(RESPAWN_DELAY)
+
+    async def _on_connect(self, reader, writer):
+        await Channel(reader, writer, self._handle).serve()
+
+    async def _handle(self, channel, msg):
+        op, args = msg['op'], msg.get('args', {})
+        if op == 'hello':
+            shard = args['shard']
+            self._channels[shard] = channel
+            self._ready[shard].set()
+            logger.info(f"[SHARDS] Worker {shard} ready ({args['users']} users)")
+        elif op == 'notify':
+            media = args.get('media')
+            if media: media = RemoteMedia(channel, media['token'], media['key'])
+            await self._notify(args['uid'], args['text'], media)
+
+    async def _channel(self, shard):
+        await asyncio.wait_for(self._ready[shard].wait(), 30)
+        return self._channels[shard]
+
+    async def call(self, uid, op, **args):
+        """Runs an op on the shard that owns `uid`."""
+        channel = await self._channel(self.ring.owner(uid))
+        return await channel.request(op, uid=uid, **args)
+
+    async def broadcast(self, op, **args):
+        """Runs an op on every shard and returns the list of results."""
+        async def one(shard):
+            return await (await self._channel(shard)).request(op, **args)
+        return await asyncio.gather(*(one(s) for s in range(self.shards)))
+
+# --- WORKER (child process) ---
+_media_refs = OrderedDict()  # token -> MediaRef, kept until the master fetches it
+_next_token = 0
+
+async def _worker_main(shard, shards, port):
+    global _owns
+    ring = HashRing(shards)
+    _owns = lambda uid: ring.owner(uid) == shard
+    governor.share(1 / shards)
+
+    async def handle(channel, msg):
+        args = msg.get('args', {})
+        if msg['op'] == 'fetch_media':
+            ref = _media_refs.pop(args['token'])
+            return base64.b64encode(await ref.fetch()).decode()
+        uid = args.pop('uid', None)
+        return await local_op(msg['op'], uid, notify, **args)
+
+    async def notify(user_id, message, media=None):
+        global _next_token
+        payload = None
+        if media:
+            _next_token += 1
+            _media_refs[_next_token] = media
+            while len(_media_refs) > 64: _media_refs.popitem(last=False)
+            payload = {'token': _next_token, 'key': media.key}
+        channel.send('notify', uid=user_id, text=message, media=payload)
+
+    reader, writer = await asyncio.open_connection('127.0.0.1', port, limit=IPC_LIMIT)
+    channel = Channel(reader, writer, handle)
+    serving = asyncio.create_task(channel.serve())
+
+    perf.start()
+    await db.init_db()
+    count = await local_op('reload', callback=notify)
+    asyncio.create_task(db.stats_flusher())
+    asyncio.create_task(hibernation_sweeper())
+    channel.send('hello', shard=shard, users=count)
+
+    # Exit together with the supervisor
+    await serving
+    await db.close_db()
+
+def worker_main(shard, shards, port):
+    asyncio.run(_worker_main(shard, shards, port))
+
+if __name__ == '__main__':
+    worker_main(*map(int, sys.argv[1:4]))
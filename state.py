@@ -0,0 +1,97 @@
+import enum
+import time
+from array import array
+from datetime import datetime, timedelta
+from sys import intern
+from config import DEFAULT_LIST, DEFAULT_INTERVAL, IST, DAILY_RESET_HOUR
+from matcher import get_matcher
+
+# --- USER STATE ---
+# One UserState per user in user_configs. Slots instead of a dict per user,
+# the four total/daily counter pairs packed in one array, and the target list
+# shared through the matcher cache, so thousands of loaded users stay small.
+
+class Mode(enum.Enum):
+    STOPPED = 'STOPPED'
+    SAFARI_INIT = 'SAFARI_INIT'
+    SEARCHING = 'SEARCHING'
+    ENGAGED = 'ENGAGED'
+
+STAT_KINDS = ('matched', 'caught', 'fled', 'shiny')
+_TOTAL = {kind: i for i, kind in enumerate(STAT_KINDS)}
+_DAILY = {kind: i + len(STAT_KINDS) for i, kind in enumerate(STAT_KINDS)}
+
+# --- STATS DAYS ---
+# Daily counters are tagged with the stats day they count; they read as zero
+# and start over once the day has changed, so nothing resets them in bulk.
+def stats_day(ts):
+    """The stats day (YYYY-MM-DD) a unix time belongs to; days roll over at DAILY_RESET_HOUR IST."""
+    return (datetime.fromtimestamp(ts, IST) - timedelta(hours=DAILY_RESET_HOUR)).date().isoformat()
+
+IST_OFFSET = int(IST.utcoffset(None).total_seconds())
+
+def ist_hour(ts):
+    """Start (unix time) of the IST clock hour a unix time falls in."""
+    return ts - (ts + IST_OFFSET) % 3600
+
+_today, _today_ends = None, 0.0
+
+def today():
+    """The current stats day; only recomputed once it is over."""
+    global _today, _today_ends
+    now = time.time()
+    if now >= _today_ends:
+        shifted = datetime.fromtimestamp(now, IST) - timedelta(hours=DAILY_RESET_HOUR)
+        _today = intern(shifted.date().isoformat())
+        start = shifted.replace(hour=0, minute=0, second=0, microsecond=0)
+        _today_ends = (start + timedelta(days=1, hours=DAILY_RESET_HOUR)).timestamp()
+    return _today
+
+class UserState:
+    __slots__ = ('matcher', 'ball', 'hunting', 'mode', 'interval', 'notification_status',
+                 'group_id', 'schedule_active', 'schedule_time', 'counters', 'day')
+
+    def __init__(self, matcher=None, ball="Safari Ball", interval=DEFAULT_INTERVAL,
+                 notification_status=0, group_id=0, schedule_active=False, schedule_time=None):
+        self.matcher = matcher or get_matcher(DEFAULT_LIST)
+        self.ball = intern(ball) if ball else ball
+        self.hunting = False
+        self.mode = Mode.STOPPED
+        self.interval = interval
+        self.notification_status = notification_status
+        self.group_id = group_id
+        self.schedule_active = schedule_active
+        self.schedule_time = intern(schedule_time) if schedule_time else None
+        self.counters = array('q', bytes(8 * 2 * len(STAT_KINDS)))  # totals, then dailies
+        self.day = today()  # stats day the dailies belong to
+
+    def total(self, kind):
+        return self.counters[_TOTAL[kind]]
+
+    def daily(self, kind):
+        self._roll()
+        return self.counters[_DAILY[kind]]
+
+    def set_counts(self, kind, total, daily, day=None):
+        """Loads stored counters; `daily` only counts if it is from the current stats `day`."""
+        self.counters[_TOTAL[kind]] = total
+        self.counters[_DAILY[kind]] = daily if day == self.day else 0
+
+    def bump(self, kind):
+        """Counts one event of `kind` ('matched', 'caught', ...) in total and today."""
+        self._roll()
+        self.counters[_TOTAL[kind]] += 1
+        self.counters[_DAILY[kind]] += 1
+
+    def _roll(self):
+        day = today()
+        if day == self.day: return
+        for i in _DAILY.values(): self.counters[i] = 0
+        self.day = day
+
+    def stats(self):
+        """Counters as the old 'stats' dict ({'total_caught': n, 'daily_caught': n, ...}), for IPC and display."""
+        self._roll()
+        out = {f"total_{kind}": self.counters[i] for kind, i in _TOTAL.items()}
+        out.update((f"daily_{kind}", self.counters[i]) for kind, i in _DAILY.items())
+        return out